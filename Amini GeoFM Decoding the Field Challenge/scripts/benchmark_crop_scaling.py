@@ -0,0 +1,86 @@
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+
+from tmp import SatelliteDataProcessor
+
+logger = logging.getLogger(__name__)
+
+
+def benchmark_crop_scaling(crop_configs: List[Dict],
+                           executors: List[str] = ("thread", "process", "dask"),
+                           max_workers: Optional[int] = None,
+                           threads_per_worker: int = 1,
+                           processor_kwargs: Optional[Dict] = None,
+                           output_path: Optional[Union[str, Path]] = None) -> pd.DataFrame:
+    """
+    Time process_multiple_crops for 1..N crop configurations with each executor.
+
+    Args:
+        crop_configs: Crop configurations (the first n are used for n crops)
+        executors: Executor modes to compare
+        max_workers: Workers per run (defaults to the number of crops in the run)
+        threads_per_worker: Threads per dask worker
+        processor_kwargs: Keyword arguments for SatelliteDataProcessor
+        output_path: Optional CSV path for the results table
+
+    Returns:
+        DataFrame with one row per (executor, n_crops) run
+    """
+    rows = []
+    for executor in executors:
+        baseline = None
+        for n_crops in range(1, len(crop_configs) + 1):
+            processor = SatelliteDataProcessor(**(processor_kwargs or {}))
+            with tempfile.TemporaryDirectory(prefix="s2_scaling_") as tmp_dir:
+                # Parquet output is combined on disk, so it needs somewhere to go
+                output = Path(tmp_dir) / "combined.parquet" if processor.output_format == "parquet" else None
+                start = time.perf_counter()
+                df = processor.process_multiple_crops(
+                    crop_configs[:n_crops],
+                    output_combined=output,
+                    max_workers=max_workers or n_crops,
+                    executor=executor,
+                    threads_per_worker=threads_per_worker
+                )
+                elapsed = time.perf_counter() - start
+                records = 0 if df is None else len(df) if isinstance(df, pd.DataFrame) else df.count_rows()
+            baseline = baseline or elapsed
+            rows.append({
+                "executor": executor,
+                "n_crops": n_crops,
+                "wall_time_s": elapsed,
+                "records": records,
+                "seconds_per_crop": elapsed / n_crops,
+                # Perfect scaling keeps wall time flat as crops are added
+                "scaling_efficiency": baseline / elapsed,
+            })
+            logger.info(f"⏱️ {executor} x{n_crops}: {elapsed:.1f}s")
+
+    results = pd.DataFrame(rows)
+    if output_path:
+        results.to_csv(output_path, index=False)
+        logger.info(f"💾 Saved benchmark results to {output_path}")
+    return results
+
+
+def main():
+    """
+    Example scaling benchmark over the configured crops.
+    """
+    crop_configs = [
+        {'geojson_path': "OIL_GEOJSON", 'date_range': '2020-01-01/2020-12-31', 'crop_type': 'oil'},
+        {'geojson_path': "COCOA_GEOJSON", 'date_range': '2020-01-01/2020-12-31', 'crop_type': 'cocoa'},
+        {'geojson_path': "RUBBER_GEOJSON", 'date_range': '2020-01-01/2020-12-31', 'crop_type': 'rubber'},
+    ]
+
+    results = benchmark_crop_scaling(crop_configs, output_path="crop_scaling_benchmark.csv")
+    print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
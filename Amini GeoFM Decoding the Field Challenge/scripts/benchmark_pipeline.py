@@ -0,0 +1,366 @@
+import logging
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import psutil
+import pystac
+import rasterio
+from pystac import ItemCollection
+from pystac.extensions.projection import ProjectionExtension
+from rasterio.transform import from_origin
+from rasterio.warp import transform_bounds
+from shapely.geometry import box, mapping, shape
+
+from columnar_io import to_compact_frame, write_compact_parquet
+from tmp import SatelliteDataProcessor
+
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_CRS = "EPSG:32630"        # UTM zone 30N, covering the challenge's West African fields
+SYNTHETIC_ORIGIN = (600000, 700000)  # Upper-left corner (easting, northing) of every scene
+PIXEL_SIZE = 10
+SCL_CLASSES = [4, 5, 6, 8, 9]        # Vegetation, bare soil, water, cloud medium/high
+
+
+def write_synthetic_cog(path: Path, data: np.ndarray, transform, crs: str = SYNTHETIC_CRS) -> None:
+    """Write one single-band uint16 Cloud-Optimized GeoTIFF."""
+    profile = {
+        "driver": "COG",
+        "dtype": "uint16",
+        "count": 1,
+        "height": data.shape[0],
+        "width": data.shape[1],
+        "crs": crs,
+        "transform": transform,
+        "nodata": 0,
+        "compress": "DEFLATE",
+        "blocksize": 256,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+
+
+def build_synthetic_catalog(root: Union[str, Path],
+                            size_px: int = 512,
+                            n_dates: int = 6,
+                            bands: Optional[List[str]] = None,
+                            collection: str = "sentinel-2-l2a",
+                            start: str = "2024-01-05",
+                            revisit_days: int = 5,
+                            seed: int = 42) -> Path:
+    """
+    Generate synthetic Sentinel-2-like COGs and a self-contained static STAC catalog.
+
+    Each date gets one COG per band plus an ``scl`` band, on a 10 m UTM
+    grid of size_px x size_px pixels. Reflectance is a smooth field plus
+    noise, so compression and read costs resemble real scenes.
+
+    Args:
+        root: Output directory
+        size_px: Scene width and height in pixels
+        n_dates: Number of acquisition dates
+        bands: Band asset names (defaults to the processor's bands)
+        collection: Collection id the items belong to
+        start: First acquisition date
+        revisit_days: Days between acquisitions
+        seed: Random seed
+
+    Returns:
+        Path to catalog.json
+    """
+    root = Path(root)
+    bands = bands or SatelliteDataProcessor().bands
+    rng = np.random.default_rng(seed)
+
+    transform = from_origin(*SYNTHETIC_ORIGIN, PIXEL_SIZE, PIXEL_SIZE)
+    left, top = SYNTHETIC_ORIGIN
+    bounds = (left, top - size_px * PIXEL_SIZE, left + size_px * PIXEL_SIZE, top)
+    footprint = box(*transform_bounds(SYNTHETIC_CRS, "EPSG:4326", *bounds))
+
+    yy, xx = np.mgrid[0:size_px, 0:size_px] / size_px
+    catalog = pystac.Catalog(id="synthetic-s2", description="Synthetic Sentinel-2 L2A scenes for benchmarking")
+    first_date = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+
+    for d in range(n_dates):
+        date = first_date + timedelta(days=d * revisit_days)
+        item_id = f"S2_SYNTH_{size_px}_{date:%Y%m%d}"
+        item_dir = root / item_id
+        item_dir.mkdir(parents=True, exist_ok=True)
+        item = pystac.Item(
+            id=item_id,
+            geometry=mapping(footprint),
+            bbox=list(footprint.bounds),
+            datetime=date,
+            properties={"eo:cloud_cover": float(rng.uniform(0, 15))},
+            collection=collection,
+        )
+        proj = ProjectionExtension.ext(item, add_if_missing=True)
+        proj.code = SYNTHETIC_CRS
+        proj.shape = [size_px, size_px]
+        proj.transform = list(transform)[:6]
+
+        for b, band in enumerate(bands):
+            phase = rng.uniform(0, 2 * np.pi)
+            field = 2000 + 1500 * np.sin(2 * np.pi * (xx + yy) + phase + b)
+            data = np.clip(field + rng.normal(0, 150, field.shape), 1, 10000).astype(np.uint16)
+            path = item_dir / f"{band}.tif"
+            write_synthetic_cog(path, data, transform)
+            item.add_asset(band, pystac.Asset(href=str(path.resolve()), media_type=pystac.MediaType.COG,
+                                              roles=["data"]))
+
+        scl = rng.choice(SCL_CLASSES, size=(size_px, size_px), p=[0.6, 0.15, 0.05, 0.1, 0.1]).astype(np.uint16)
+        write_synthetic_cog(item_dir / "scl.tif", scl, transform)
+        item.add_asset("scl", pystac.Asset(href=str((item_dir / "scl.tif").resolve()),
+                                           media_type=pystac.MediaType.COG, roles=["data"]))
+        catalog.add_item(item)
+
+    catalog.normalize_hrefs(str(root))
+    catalog.save(catalog_type=pystac.CatalogType.SELF_CONTAINED)
+    logger.info(f"🛰️ Wrote {n_dates} synthetic scenes of {size_px}x{size_px} px to {root}")
+    return root / "catalog.json"
+
+
+class _LocalItemSearch:
+    """Result of LocalStacClient.search, exposing the ItemSearch methods the processor uses."""
+
+    def __init__(self, items: List[pystac.Item]):
+        self._items = items
+
+    def items(self) -> Iterator[pystac.Item]:
+        return iter(self._items)
+
+    def item_collection(self) -> ItemCollection:
+        return ItemCollection(self._items)
+
+
+class LocalStacClient:
+    """
+    In-process stand-in for a pystac_client.Client over a static catalog.
+
+    Static catalogs have no /search endpoint, so collection, geometry,
+    datetime and eo:cloud_cover filters are evaluated locally.
+    """
+
+    def __init__(self, catalog_path: Union[str, Path]):
+        self.catalog = pystac.Catalog.from_file(str(catalog_path))
+        self._items = list(self.catalog.get_items(recursive=True))
+
+    def search(self,
+               collections: Optional[List[str]] = None,
+               intersects: Optional[Dict] = None,
+               datetime: Optional[str] = None,
+               query: Optional[Dict] = None,
+               max_items: Optional[int] = None,
+               **kwargs) -> _LocalItemSearch:
+        geometry = shape(intersects) if intersects else None
+        start, end = _parse_date_range(datetime)
+        max_cloud = (query or {}).get("eo:cloud_cover", {}).get("lte")
+
+        matches = []
+        for item in self._items:
+            if collections and item.collection_id not in collections:
+                continue
+            if geometry is not None and not geometry.intersects(shape(item.geometry)):
+                continue
+            if (start and item.datetime < start) or (end and item.datetime > end):
+                continue
+            if max_cloud is not None and item.properties.get("eo:cloud_cover", 0) > max_cloud:
+                continue
+            matches.append(item)
+        return _LocalItemSearch(matches[:max_items])
+
+
+def _parse_date_range(date_range: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Parse "start/end" (either side may be ".." or empty) into aware datetimes."""
+    if not date_range:
+        return None, None
+    parts = date_range.split("/")
+    start_text, end_text = parts[0], parts[-1]
+
+    def parse(text: str, end_of_day: bool) -> Optional[datetime]:
+        if text in ("", ".."):
+            return None
+        value = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        if end_of_day and len(text) == 10:
+            value += timedelta(days=1) - timedelta(microseconds=1)
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+    return parse(start_text, False), parse(end_text, True)
+
+
+class StageMonitor:
+    """
+    Record wall time, bytes read and peak RSS for named pipeline stages.
+
+    Bytes read come from the process I/O counters (``read_chars`` where
+    available, so page-cache hits are counted too); peak memory is sampled
+    from a background thread while each stage runs.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.stages: Dict[str, Dict] = {}
+
+    def _bytes_read(self) -> int:
+        try:
+            counters = self.process.io_counters()
+        except (AttributeError, psutil.Error):
+            return 0
+        return getattr(counters, "read_chars", counters.read_bytes)
+
+    @contextmanager
+    def stage(self, name: str):
+        peak = [self.process.memory_info().rss]
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(self.interval):
+                peak[0] = max(peak[0], self.process.memory_info().rss)
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        read_before = self._bytes_read()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            done.set()
+            sampler.join()
+            peak[0] = max(peak[0], self.process.memory_info().rss)
+            self.stages[name] = {
+                "wall_time_s": elapsed,
+                "bytes_read": self._bytes_read() - read_before,
+                "peak_rss_mb": peak[0] / 1024**2,
+            }
+
+
+def run_pipeline_benchmark(catalog_path: Union[str, Path],
+                           output_dir: Union[str, Path],
+                           n_samples: int,
+                           aoi_fraction: float = 1.0,
+                           date_range: str = "2024-01-01/2024-12-31",
+                           processor_kwargs: Optional[Dict] = None) -> Dict:
+    """
+    Run search -> load -> sample -> convert -> write once against a local catalog.
+
+    Args:
+        catalog_path: catalog.json written by build_synthetic_catalog
+        output_dir: Directory for the written output
+        n_samples: Pixels to sample
+        aoi_fraction: Side of the AOI as a fraction of the scene footprint
+        date_range: Search date range
+        processor_kwargs: Keyword arguments for SatelliteDataProcessor
+
+    Returns:
+        Dict of per-stage metrics plus rows and rows/second
+    """
+    processor = SatelliteDataProcessor(**(processor_kwargs or {}))
+    processor.client = LocalStacClient(catalog_path)
+    monitor = StageMonitor()
+
+    footprint = shape(next(iter(processor.client._items)).geometry)
+    minx, miny, maxx, maxy = footprint.bounds
+    half_w, half_h = (maxx - minx) * aoi_fraction / 2, (maxy - miny) * aoi_fraction / 2
+    cx, cy = footprint.centroid.x, footprint.centroid.y
+    geometry = mapping(box(cx - half_w, cy - half_h, cx + half_w, cy + half_h))
+
+    with monitor.stage("search"):
+        items, search = processor.search_satellite_data(geometry, date_range)
+    with monitor.stage("load"):
+        dataset = processor.load_satellite_data(search, geometry, date_range=date_range)
+    with monitor.stage("sample"):
+        df = processor.extract_pixel_timeseries(dataset, n_samples, crop_type="synthetic")
+    if df is None:
+        raise RuntimeError("Synthetic pipeline produced no rows")
+
+    output_dir = Path(output_dir)
+    if processor.output_format == "parquet":
+        with monitor.stage("convert"):
+            converted = to_compact_frame(df, processor.bands)
+        with monitor.stage("write"):
+            write_compact_parquet(converted, output_dir / "dataset", processor.bands)
+    else:
+        with monitor.stage("convert"):
+            converted = df.to_csv(index=False)
+        with monitor.stage("write"):
+            (output_dir / "timeseries.csv").write_text(converted)
+
+    total = sum(s["wall_time_s"] for s in monitor.stages.values())
+    return {
+        "stages": monitor.stages,
+        "rows": len(df),
+        "total_s": total,
+        "rows_per_s": len(df) / total,
+        "loaded_pixels": int(dataset.sizes["x"] * dataset.sizes["y"]),
+        "n_items": len(items),
+    }
+
+
+def benchmark_pipeline(scene_sizes: Sequence[int] = (256, 512, 1024),
+                       sample_counts: Sequence[int] = (100, 1000, 5000),
+                       aoi_fraction: float = 1.0,
+                       n_dates: int = 6,
+                       processor_kwargs: Optional[Dict] = None,
+                       work_dir: Optional[Union[str, Path]] = None,
+                       output_path: Optional[Union[str, Path]] = None) -> pd.DataFrame:
+    """
+    Benchmark the extraction pipeline across AOI sizes and pixel counts.
+
+    Args:
+        scene_sizes: Synthetic scene sides in pixels (the AOI grows with them)
+        sample_counts: Pixels sampled per run
+        aoi_fraction: Side of the AOI as a fraction of each scene
+        n_dates: Acquisition dates per scene
+        processor_kwargs: Keyword arguments for SatelliteDataProcessor
+        work_dir: Where catalogs and outputs go (a temporary directory by default)
+        output_path: Optional CSV path for the results table
+
+    Returns:
+        DataFrame with one row per (scene size, sample count, stage)
+    """
+    rows = []
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        tmp = Path(tmp)
+        for size_px in scene_sizes:
+            catalog_path = build_synthetic_catalog(tmp / f"catalog_{size_px}", size_px=size_px, n_dates=n_dates)
+            for n_samples in sample_counts:
+                run_dir = tmp / f"out_{size_px}_{n_samples}"
+                run_dir.mkdir()
+                result = run_pipeline_benchmark(catalog_path, run_dir, n_samples,
+                                                aoi_fraction=aoi_fraction, processor_kwargs=processor_kwargs)
+                for stage, metrics in result["stages"].items():
+                    rows.append({"scene_px": size_px, "aoi_km2": (size_px * aoi_fraction * PIXEL_SIZE / 1000) ** 2,
+                                 "n_samples": n_samples, "stage": stage, **metrics,
+                                 "rows": result["rows"], "rows_per_s": result["rows_per_s"]})
+                logger.info(f"⏱️ {size_px}px x {n_samples} samples: {result['total_s']:.2f}s, "
+                            f"{result['rows_per_s']:,.0f} rows/s")
+
+    results = pd.DataFrame(rows)
+    if output_path:
+        results.to_csv(output_path, index=False)
+        logger.info(f"💾 Saved benchmark results to {output_path}")
+    return results
+
+
+def main():
+    """
+    Example benchmark over synthetic scenes, for the CSV and Parquet outputs.
+    """
+    for output_format in ["csv", "parquet"]:
+        results = benchmark_pipeline(processor_kwargs={"output_format": output_format, "cloud_mask": True},
+                                     output_path=f"pipeline_benchmark_{output_format}.csv")
+        print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
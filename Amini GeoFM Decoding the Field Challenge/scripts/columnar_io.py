@@ -0,0 +1,282 @@
+import logging
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Sentinel-2 L2A digital numbers: reflectance = DN * scale + offset
+REFLECTANCE_SCALE = 0.0001
+REFLECTANCE_OFFSET = 0.0
+NODATA = 0
+
+PARTITION_COLS = ["crop_type", "month"]
+
+
+def to_compact_frame(df: pd.DataFrame, bands: List[str]) -> pd.DataFrame:
+    """
+    Convert an extracted time-series frame to its compact columnar layout.
+
+    Reflectance is stored as native uint16 digital numbers, ids and labels
+    as categoricals (dictionary-encoded in Parquet) and a ``month`` column
+    is added for date partitioning.
+
+    Args:
+        df: Frame produced by SatelliteDataProcessor.extract_pixel_timeseries,
+            with band values as digital numbers
+        bands: Band columns to encode as uint16
+
+    Returns:
+        Compact DataFrame
+    """
+    out = df.copy()
+    for band in bands:
+        # Values may have been promoted to float by masking; they are still DNs
+        values = out[band].to_numpy(dtype="float64")
+        out[band] = np.clip(np.rint(values), 0, np.iinfo(np.uint16).max).astype("uint16")
+
+    out["time"] = pd.to_datetime(out["time"])
+    out["month"] = out["time"].dt.strftime("%Y-%m")
+    for col in ["unique_id", "crop_type"]:
+        if col in out.columns:
+            out[col] = out[col].astype("category")
+    return out
+
+
+def _schema_metadata(bands: List[str]) -> Dict[bytes, bytes]:
+    """Key/value metadata recording how to decode the uint16 bands."""
+    return {
+        b"reflectance_scale": str(REFLECTANCE_SCALE).encode(),
+        b"reflectance_offset": str(REFLECTANCE_OFFSET).encode(),
+        b"nodata": str(NODATA).encode(),
+        b"bands": ",".join(bands).encode(),
+    }
+
+
+def write_partitioned_parquet(df: pd.DataFrame,
+                              root: Union[str, Path],
+                              bands: List[str],
+                              basename: Optional[str] = None,
+                              existing_data_behavior: str = "overwrite_or_ignore") -> Path:
+    """
+    Write extracted time series as a Parquet dataset partitioned by crop and month.
+
+    Args:
+        df: Extracted time-series frame
+        root: Dataset root directory
+        bands: Band columns
+        basename: File name prefix, so several crops can write to one root
+        existing_data_behavior: pyarrow behaviour for files already under ``root``
+
+    Returns:
+        Dataset root path
+    """
+    return write_compact_parquet(to_compact_frame(df, bands), root, bands, basename, existing_data_behavior)
+
+
+def write_compact_parquet(compact: pd.DataFrame,
+                          root: Union[str, Path],
+                          bands: List[str],
+                          basename: Optional[str] = None,
+                          existing_data_behavior: str = "overwrite_or_ignore") -> Path:
+    """
+    Write a frame already converted by to_compact_frame as a partitioned dataset.
+
+    Files named after ``basename`` replace earlier ones with the same name;
+    other files under ``root`` are kept (and later read by open_dataset), so
+    writers sharing a root need distinct basenames, and a root reused across
+    runs should be cleared first (see clear_dataset).
+
+    Args:
+        compact: Output of to_compact_frame
+        root: Dataset root directory
+        bands: Band columns
+        basename: File name prefix, so several crops can write to one root
+            (defaults to the crop type)
+        existing_data_behavior: "overwrite_or_ignore" (default) or
+            "delete_matching" to drop the partitions being written first
+
+    Returns:
+        Dataset root path
+    """
+    root = Path(root)
+    table = pa.Table.from_pandas(compact, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **_schema_metadata(bands)})
+
+    prefix = basename or str(compact["crop_type"].iloc[0])
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITION_COLS,
+        partitioning_flavor="hive",
+        basename_template=f"{prefix}-{{i}}.parquet",
+        existing_data_behavior=existing_data_behavior,
+    )
+    logger.info(f"💾 Wrote {len(compact)} records to {root} (partitioned by {PARTITION_COLS})")
+    return root
+
+
+def clear_dataset(root: Union[str, Path]) -> Path:
+    """Remove a dataset root left by an earlier run, so no stale files are read back."""
+    root = Path(root)
+    if root.exists():
+        shutil.rmtree(root)
+        logger.info(f"🧹 Cleared existing dataset at {root}")
+    return root
+
+
+def move_into_dataset(src_root: Union[str, Path], dst_root: Union[str, Path], basename: str) -> Path:
+    """
+    Move the files of one partitioned dataset into another, renamed after ``basename``.
+
+    Files keep their crop/month partition directories, so nothing is read
+    or rewritten, and ``src_root`` is removed afterwards.
+
+    Returns:
+        Destination dataset root
+    """
+    src_root, dst_root = Path(src_root), Path(dst_root)
+    for i, path in enumerate(sorted(src_root.rglob("*.parquet"))):
+        target = dst_root / path.parent.relative_to(src_root) / f"{basename}-{i}.parquet"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path), str(target))
+    shutil.rmtree(src_root, ignore_errors=True)
+    return dst_root
+
+
+def open_dataset(root: Union[str, Path]) -> ds.Dataset:
+    """Open a partitioned extraction dataset lazily, without reading any rows."""
+    return ds.dataset(root, format="parquet", partitioning="hive")
+
+
+def decode_reflectance(df: pd.DataFrame, bands: List[str]) -> pd.DataFrame:
+    """Convert uint16 band columns back to float32 reflectance."""
+    for band in bands:
+        if band in df.columns:
+            df[band] = (df[band].astype("float32") * np.float32(REFLECTANCE_SCALE)
+                        + np.float32(REFLECTANCE_OFFSET))
+    return df
+
+
+def read_timeseries(root: Union[str, Path],
+                    bands: List[str],
+                    crop_types: Optional[List[str]] = None,
+                    columns: Optional[List[str]] = None,
+                    as_reflectance: bool = True) -> pd.DataFrame:
+    """
+    Read (a filtered part of) the dataset into pandas.
+
+    Args:
+        root: Dataset root directory
+        bands: Band columns
+        crop_types: Optional crops to read; other partitions are skipped
+        columns: Optional column projection
+        as_reflectance: Decode uint16 bands to float32 reflectance
+
+    Returns:
+        DataFrame
+    """
+    dataset = open_dataset(root)
+    flt = pc.field("crop_type").isin(crop_types) if crop_types else None
+    df = dataset.to_table(columns=columns, filter=flt).to_pandas()
+    return decode_reflectance(df, bands) if as_reflectance else df
+
+
+def open_combined(path: Union[str, Path]) -> ds.Dataset:
+    """Open the single shuffled file written by combine_and_shuffle lazily."""
+    return ds.dataset(path, format="parquet")
+
+
+def _iter_batches(dataset: ds.Dataset, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Yield record batches from the lazily scanned dataset."""
+    yield from dataset.to_batches(batch_size=batch_size)
+
+
+def _widen_dictionaries(table: pa.Table) -> pa.Table:
+    """Use int32 dictionary indices, so dictionaries unified across files cannot overflow int8."""
+    fields = [
+        pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type), f.nullable, f.metadata)
+        if pa.types.is_dictionary(f.type) else f
+        for f in table.schema
+    ]
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def combine_and_shuffle(root: Union[str, Path],
+                        output_path: Union[str, Path],
+                        seed: int = 42,
+                        n_buckets: int = 16,
+                        batch_size: int = 65536) -> int:
+    """
+    Combine all crops of a dataset and shuffle rows out of core.
+
+    Rows are streamed from the lazily scanned dataset and scattered into
+    ``n_buckets`` random spill files; each bucket is then shuffled in memory
+    and appended to the output file, so peak memory is one bucket rather
+    than the full dataset.
+
+    Args:
+        root: Dataset root directory
+        output_path: Output Parquet file
+        seed: Random seed for reproducibility
+        n_buckets: Number of spill buckets
+        batch_size: Rows per scanned batch
+
+    Returns:
+        Number of rows written
+    """
+    rng = np.random.default_rng(seed)
+    dataset = open_dataset(root)
+    output_path = Path(output_path)
+    spill_dir = Path(tempfile.mkdtemp(prefix="s2_shuffle_"))
+    writers: Dict[int, pq.ParquetWriter] = {}
+    schema = None
+    total = 0
+
+    try:
+        # Pass 1: scatter rows into random buckets
+        for batch in _iter_batches(dataset, batch_size):
+            table = pa.Table.from_batches([batch])
+            # Partition values come back as plain strings; re-encode them
+            for col in PARTITION_COLS:
+                idx = table.schema.get_field_index(col)
+                table = table.set_column(idx, col, pc.dictionary_encode(table[col]))
+            # Dictionary ids from different files may not share a dictionary
+            table = _widen_dictionaries(table).unify_dictionaries()
+            if schema is None:
+                schema = table.schema
+            table = table.cast(schema)
+            buckets = rng.integers(0, n_buckets, size=table.num_rows)
+            for b in np.unique(buckets):
+                if b not in writers:
+                    writers[b] = pq.ParquetWriter(spill_dir / f"bucket-{b}.parquet", schema)
+                writers[b].write_table(table.filter(pa.array(buckets == b)))
+            total += table.num_rows
+        for writer in writers.values():
+            writer.close()
+
+        if schema is None:
+            logger.error("❌ No rows found to combine")
+            return 0
+
+        # Pass 2: shuffle each bucket in memory and append to the output
+        metadata = {**(schema.metadata or {}), **(dataset.schema.metadata or {})}
+        with pq.ParquetWriter(output_path, schema.with_metadata(metadata)) as out:
+            for b in sorted(writers):
+                bucket = pq.read_table(spill_dir / f"bucket-{b}.parquet")
+                bucket = bucket.take(pa.array(rng.permutation(bucket.num_rows)))
+                out.write_table(bucket.unify_dictionaries().cast(schema))
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    logger.info(f"✅ Combined and shuffled {total} records into {output_path}")
+    return total
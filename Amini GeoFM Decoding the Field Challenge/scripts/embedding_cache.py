@@ -0,0 +1,200 @@
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+KEY_DTYPE = np.dtype("S16")  # 128-bit blake2b digest per pixel
+
+
+def hash_weights(weights_path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """
+    Hash a model weights file (e.g. default_model.pt).
+
+    Args:
+        weights_path: Path to the weights file
+        chunk_size: Bytes read per chunk
+
+    Returns:
+        Hex digest identifying the weights
+    """
+    digest = hashlib.sha256()
+    with open(weights_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _as_rows(array: Union[np.ndarray, torch.Tensor], dtype: str, n: int) -> np.ndarray:
+    """Flatten one input to a contiguous (n, nbytes) uint8 view with a fixed dtype."""
+    if isinstance(array, torch.Tensor):
+        array = array.detach().cpu().numpy()
+    array = np.ascontiguousarray(np.asarray(array).reshape(n, -1), dtype=dtype)
+    return array.view(np.uint8).reshape(n, -1)
+
+
+def hash_pixel_inputs(x, mask, dynamic_world, latlons, month) -> np.ndarray:
+    """
+    Content hash of each pixel's full encoder input.
+
+    Args:
+        x: (N, T, C) bands
+        mask: (N, T, C) mask
+        dynamic_world: (N, T) dynamic world classes
+        latlons: (N, 2) coordinates
+        month: (N,) or (N, T) month indices
+
+    Returns:
+        (N,) array of 16-byte digests
+    """
+    n = len(x)
+    rows = np.concatenate([
+        _as_rows(x, "float32", n),
+        _as_rows(mask, "uint8", n),
+        _as_rows(dynamic_world, "int64", n),
+        _as_rows(latlons, "float32", n),
+        _as_rows(month, "int64", n),
+    ], axis=1)
+    keys = np.empty(n, dtype=KEY_DTYPE)
+    for i in range(n):
+        keys[i] = hashlib.blake2b(rows[i].tobytes(), digest_size=16).digest()
+    return keys
+
+
+class EmbeddingStore:
+    """
+    Content-addressed, append-only cache of Presto encoder embeddings.
+
+    Embeddings live in a raw float32 file read through a memory map, with a
+    parallel file of pixel keys as the index. Stores are namespaced by the
+    hash of the weights file, so changing the weights never reuses stale
+    embeddings.
+    """
+
+    def __init__(self,
+                 root: Union[str, Path],
+                 weights_path: Union[str, Path],
+                 embedding_dim: int = 128):
+        """
+        Open (or create) the store for a given weights file.
+
+        Args:
+            root: Cache directory
+            weights_path: Encoder weights file used to produce the embeddings
+            embedding_dim: Encoder output dimension
+        """
+        self.weights_hash = hash_weights(weights_path)
+        self.root = Path(root) / self.weights_hash[:16]
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.embedding_dim = embedding_dim
+        self.embeddings_path = self.root / "embeddings.f32"
+        self.keys_path = self.root / "keys.bin"
+        self.stats = {"hits": 0, "misses": 0, "encoded": 0}
+
+        keys = np.fromfile(self.keys_path, dtype=KEY_DTYPE) if self.keys_path.exists() else np.empty(0, KEY_DTYPE)
+        row_bytes = embedding_dim * np.dtype(np.float32).itemsize
+        n_rows = self.embeddings_path.stat().st_size // row_bytes if self.embeddings_path.exists() else 0
+        # A crash between the two appends leaves extra embeddings; only indexed rows count
+        self._size = min(len(keys), n_rows)
+        self._index: Dict[bytes, int] = {bytes(k): i for i, k in enumerate(keys[:self._size])}
+        self._memmap: Optional[np.memmap] = None
+        logger.info(f"🗄️ Embedding store {self.root} with {self._size} cached pixels")
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Read-only memmap over all cached embeddings, shape (len(self), embedding_dim)."""
+        if self._size == 0:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        if self._memmap is None or len(self._memmap) != self._size:
+            self._memmap = np.memmap(self.embeddings_path, dtype=np.float32, mode="r",
+                                     shape=(self._size, self.embedding_dim))
+        return self._memmap
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Row of each key in the store, or -1 when not cached."""
+        return np.fromiter((self._index.get(bytes(k), -1) for k in keys), dtype=np.int64, count=len(keys))
+
+    def _append(self, keys: np.ndarray, embeddings: np.ndarray) -> None:
+        """Append new embeddings, then their keys, so the index never points past the data."""
+        with open(self.embeddings_path, "ab") as f:
+            # Truncate rows orphaned by an earlier interrupted append
+            f.truncate(self._size * self.embedding_dim * np.dtype(np.float32).itemsize)
+            f.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+        with open(self.keys_path, "ab") as f:
+            f.truncate(self._size * KEY_DTYPE.itemsize)
+            f.write(keys.astype(KEY_DTYPE).tobytes())
+        for i, k in enumerate(keys):
+            self._index[bytes(k)] = self._size + i
+        self._size += len(keys)
+
+    def encode(self,
+               encoder: Callable,
+               x, mask, dynamic_world, latlons, month,
+               batch_size: int = 64,
+               device: Union[str, torch.device] = "cpu") -> np.ndarray:
+        """
+        Return the row of every pixel, encoding only pixels not cached yet.
+
+        Args:
+            encoder: Presto encoder (e.g. pretrained_model.encoder)
+            x, mask, dynamic_world, latlons, month: Presto inputs for N pixels
+            batch_size: Encoder batch size for unseen pixels
+            device: Device the encoder runs on
+
+        Returns:
+            (N,) row indices into ``self.embeddings``
+        """
+        keys = hash_pixel_inputs(x, mask, dynamic_world, latlons, month)
+        rows = self.lookup(keys)
+        missing = np.flatnonzero(rows < 0)
+
+        # Identical inputs inside the request are encoded once
+        _, first = np.unique(keys[missing], return_index=True)
+        todo = missing[np.sort(first)]
+        self.stats["hits"] += len(keys) - len(missing)
+        self.stats["misses"] += len(missing)
+        logger.info(f"🧠 {len(keys) - len(missing)} cached, {len(todo)} pixels to encode")
+
+        tensors = [torch.as_tensor(t) for t in (x, mask, dynamic_world, latlons, month)]
+        with torch.no_grad():
+            for start in range(0, len(todo), batch_size):
+                idx = torch.from_numpy(todo[start:start + batch_size])
+                bx, bmask, bdw, blatlons, bmonth = [t[idx].to(device) for t in tensors]
+                emb = encoder(bx.float(), dynamic_world=bdw.long(), mask=bmask.bool(),
+                              latlons=blatlons.float(), month=bmonth.long())
+                self._append(keys[todo[start:start + batch_size]], emb.cpu().numpy())
+        self.stats["encoded"] += len(todo)
+
+        if len(missing):
+            rows[missing] = self.lookup(keys[missing])
+        return rows
+
+    def materialize(self, rows: np.ndarray, output_path: Union[str, Path], chunk_size: int = 65536) -> np.ndarray:
+        """
+        Write the embeddings of ``rows``, in order, to a .npy file opened as a memmap.
+
+        Lets downstream classifiers read a dataset's features from disk
+        without loading the whole matrix into RAM.
+
+        Args:
+            rows: Row indices returned by encode
+            output_path: Destination .npy file
+            chunk_size: Rows copied per chunk
+
+        Returns:
+            Memmap of shape (len(rows), embedding_dim)
+        """
+        out = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32,
+                                        shape=(len(rows), self.embedding_dim))
+        source = self.embeddings
+        for start in range(0, len(rows), chunk_size):
+            out[start:start + chunk_size] = source[rows[start:start + chunk_size]]
+        out.flush()
+        return out
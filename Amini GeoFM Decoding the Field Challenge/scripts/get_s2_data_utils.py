@@ -46,7 +46,9 @@ import pandas as pd
 import xarray as xr
 from tqdm import tqdm
 
-def run_extraction(crop_type, geometry, date_range, output_file, nb_pixels=100, seed=42):
+from columnar_io import clear_dataset, combine_and_shuffle, write_partitioned_parquet
+
+def run_extraction(crop_type, geometry, date_range, output_file, nb_pixels=100, seed=42, output_format="csv"):
     print(f"\n📦 Processing {crop_type.upper()}")
 
     bands_to_keep = ['red', 'nir', 'swir16', 'swir22', 'blue', 'green',
@@ -107,38 +109,56 @@ def run_extraction(crop_type, geometry, date_range, output_file, nb_pixels=100,
             records.append(row)
 
     df = pd.DataFrame(records)
-    df.to_csv(output_file, index=False)
+    if output_format == "parquet":
+        # Bandes en uint16 natif (DN), ids/labels encodés en dictionnaire, partitions culture/mois
+        write_partitioned_parquet(df, output_file, bands_to_keep, basename=crop_type)
+    else:
+        df.to_csv(output_file, index=False)
     print(f"✅ Saved: {output_file}")
 
 
 # Paramètres généraux
 date_range = "2020-01-01/2020-01-10"
+output_format = "csv"  # ou "parquet" pour le dataset partitionné (uint16, culture/mois)
+
+if output_format == "parquet":
+    # Repartir d'un dataset vide : les fichiers d'un run précédent seraient relus à la fusion
+    clear_dataset("./../data/processed/s2_dataset")
 
 # Lancement automatique
 for crop_type, info in aoi_dict.items():
     geometry = info["geometry"]
-    output_file = f"./../data/processed/s2_{crop_type}_dask.csv"
+    if output_format == "parquet":
+        output_file = "./../data/processed/s2_dataset"
+    else:
+        output_file = f"./../data/processed/s2_{crop_type}_dask.csv"
     
     run_extraction(
         crop_type=crop_type,
         geometry=geometry,
         date_range=date_range,
         output_file=output_file,
-        nb_pixels=100  # tu peux ajuster à 50 ou 300
+        nb_pixels=100,  # tu peux ajuster à 50 ou 300
+        output_format=output_format
     )
 
-import pandas as pd
+if output_format == "parquet":
+    # Fusion et mélange hors mémoire à partir du dataset partitionné (lecture paresseuse)
+    combine_and_shuffle("./../data/processed/s2_dataset", "./../data/processed/s2_all_shuffled.parquet", seed=42)
+    print("✅ Fichier combiné créé : s2_all_shuffled.parquet")
+else:
+    import pandas as pd
 
-# Liste des fichiers à fusionner
-files = ["./../data/processed/s2_oil_dask.csv", "./../data/processed/s2_cocoa_dask.csv", "./../data/processed/s2_rubber_dask.csv"]
+    # Liste des fichiers à fusionner
+    files = ["./../data/processed/s2_oil_dask.csv", "./../data/processed/s2_cocoa_dask.csv", "./../data/processed/s2_rubber_dask.csv"]
 
-# Chargement et concaténation
-df_all = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
+    # Chargement et concaténation
+    df_all = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
 
-# Mélange aléatoire des lignes
-df_all = df_all.sample(frac=1, random_state=42).reset_index(drop=True)
+    # Mélange aléatoire des lignes
+    df_all = df_all.sample(frac=1, random_state=42).reset_index(drop=True)
 
-# Sauvegarde dans un fichier final
-df_all.to_csv("./../data/processed/s2_all_shuffled.csv", index=False)
+    # Sauvegarde dans un fichier final
+    df_all.to_csv("./../data/processed/s2_all_shuffled.csv", index=False)
 
-print("✅ Fichier combiné créé : s2_all_shuffled.csv")
+    print("✅ Fichier combiné créé : s2_all_shuffled.csv")
@@ -0,0 +1,172 @@
+import logging
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pyarrow.parquet as pq
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import GaussianNB
+from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+EmbeddingSource = Union[str, Path, np.ndarray]
+
+
+def iter_embedding_chunks(source: EmbeddingSource,
+                          chunk_size: int = 65536,
+                          limit: Optional[int] = None) -> Iterator[np.ndarray]:
+    """
+    Stream float32 embedding chunks from disk.
+
+    Args:
+        source: .npy file (opened as a memmap), in-memory/memmap array, or a
+            Parquet file whose columns are the embedding dimensions
+        chunk_size: Rows per chunk
+        limit: Stop after this many rows
+
+    Yields:
+        (rows, dim) float32 arrays
+    """
+    if isinstance(source, (str, Path)) and Path(source).suffix == ".parquet":
+        seen = 0
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            chunk = np.column_stack([col.to_numpy(zero_copy_only=False) for col in batch.columns])
+            if limit is not None:
+                chunk = chunk[:limit - seen]
+            seen += len(chunk)
+            yield chunk.astype(np.float32, copy=False)
+            if limit is not None and seen >= limit:
+                return
+        return
+
+    array = np.load(source, mmap_mode="r") if isinstance(source, (str, Path)) else source
+    n_rows = len(array) if limit is None else min(limit, len(array))
+    for start in range(0, n_rows, chunk_size):
+        yield np.asarray(array[start:min(start + chunk_size, n_rows)], dtype=np.float32)
+
+
+class OutOfCoreClassifier:
+    """
+    Classifier trained by streaming embedding chunks, with bounded memory.
+
+    A first pass fits a StandardScaler incrementally; the following epochs
+    feed standardized chunks to an incrementally trainable model
+    (logistic-loss SGD by default, or Gaussian naive Bayes). Class weights
+    are computed from the full label vector, matching the notebook's
+    balanced ``class_weights_dict``.
+    """
+
+    def __init__(self,
+                 model: str = "sgd",
+                 epochs: int = 5,
+                 chunk_size: int = 65536,
+                 class_weight: Optional[Dict[int, float]] = None,
+                 seed: int = 42):
+        """
+        Initialize the classifier.
+
+        Args:
+            model: "sgd" (logistic regression via SGD) or "nb" (GaussianNB)
+            epochs: Passes over the data (SGD only)
+            chunk_size: Rows per streamed chunk
+            class_weight: Optional per-class weights (defaults to balanced)
+            seed: Random seed
+        """
+        if model not in ("sgd", "nb"):
+            raise ValueError(f"Unsupported model: {model}")
+        self.model_name = model
+        self.epochs = epochs if model == "sgd" else 1
+        self.chunk_size = chunk_size
+        self.class_weight = class_weight
+        self.seed = seed
+        self.scaler = StandardScaler()
+        if model == "sgd":
+            self.model = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=seed)
+        else:
+            self.model = GaussianNB()
+
+    def fit(self, source: EmbeddingSource, labels: np.ndarray,
+            limit: Optional[int] = None) -> "OutOfCoreClassifier":
+        """
+        Train on every row of ``source`` (or the first ``limit`` rows).
+
+        Args:
+            source: Embedding source (see iter_embedding_chunks)
+            labels: (N,) labels aligned with the source rows
+            limit: Optional row cap
+
+        Returns:
+            self
+        """
+        labels = np.asarray(labels)[:limit]
+        self.classes_ = np.unique(labels)
+        if self.class_weight is None:
+            counts = np.bincount(np.searchsorted(self.classes_, labels), minlength=len(self.classes_))
+            weights = len(labels) / (len(self.classes_) * np.maximum(counts, 1))
+            self.class_weight = dict(zip(self.classes_.tolist(), weights.tolist()))
+        weight_lookup = np.array([self.class_weight[c] for c in self.classes_])
+
+        for chunk in iter_embedding_chunks(source, self.chunk_size, limit):
+            self.scaler.partial_fit(chunk)
+
+        rng = np.random.default_rng(self.seed)
+        for epoch in range(self.epochs):
+            start = 0
+            for chunk in iter_embedding_chunks(source, self.chunk_size, limit):
+                y = labels[start:start + len(chunk)]
+                start += len(chunk)
+                # Shuffle within the chunk so SGD does not see label runs
+                order = rng.permutation(len(chunk))
+                X = self.scaler.transform(chunk[order])
+                y = y[order]
+                sample_weight = weight_lookup[np.searchsorted(self.classes_, y)]
+                self.model.partial_fit(X, y, classes=self.classes_, sample_weight=sample_weight)
+            logger.info(f"🔁 Epoch {epoch + 1}/{self.epochs} over {start} rows")
+        return self
+
+    def predict_proba(self, source: EmbeddingSource) -> np.ndarray:
+        """Class probabilities for every row of ``source``, computed chunk by chunk."""
+        return np.concatenate([
+            self.model.predict_proba(self.scaler.transform(chunk))
+            for chunk in iter_embedding_chunks(source, self.chunk_size)
+        ])
+
+
+def measure_training(source: EmbeddingSource,
+                     labels: np.ndarray,
+                     sizes: Sequence[int] = (200_000, 400_000, 800_000, 1_600_000),
+                     model: str = "sgd",
+                     **kwargs) -> List[Dict]:
+    """
+    Report wall time and peak traced memory as the training set grows.
+
+    Sizes beyond the number of available rows are skipped.
+
+    Args:
+        source: Embedding source (see iter_embedding_chunks)
+        labels: (N,) labels aligned with the source rows
+        sizes: Training set sizes to measure
+        model: Model passed to OutOfCoreClassifier
+        **kwargs: Extra OutOfCoreClassifier arguments
+
+    Returns:
+        List of dicts with n_rows, wall_time_s and peak_memory_mb
+    """
+    n_available = len(labels)
+    results = []
+    for size in sizes:
+        if size > n_available:
+            logger.warning(f"⚠️ Skipping {size} rows (only {n_available} available)")
+            continue
+        tracemalloc.start()
+        start = time.perf_counter()
+        OutOfCoreClassifier(model=model, **kwargs).fit(source, labels, limit=size)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append({"n_rows": size, "wall_time_s": elapsed, "peak_memory_mb": peak / 1024**2})
+        logger.info(f"📊 {size} rows: {elapsed:.1f}s, peak {peak / 1024**2:.1f} MB")
+    return results
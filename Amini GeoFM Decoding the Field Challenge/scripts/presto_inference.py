@@ -0,0 +1,210 @@
+import copy
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import log_loss
+from sklearn.model_selection import train_test_split
+
+logger = logging.getLogger(__name__)
+
+
+def quantize_encoder(encoder: torch.nn.Module) -> torch.nn.Module:
+    """
+    Apply dynamic int8 quantization to the encoder's Linear layers.
+
+    Weights are stored as int8 and activations quantized on the fly, which
+    speeds up the transformer's matmuls on CPU. The original module is left
+    untouched.
+
+    Args:
+        encoder: Presto encoder (e.g. pretrained_model.encoder)
+
+    Returns:
+        Quantized copy of the encoder
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        copy.deepcopy(encoder).cpu().eval(), {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+class PrestoCPUEncoder:
+    """
+    CPU inference wrapper for the Presto encoder.
+
+    Runs under ``torch.inference_mode`` with preallocated outputs, and can
+    auto-tune batch size and intra-op threads for the host and optionally
+    run an int8 dynamically quantized copy of the encoder. The wrapper
+    works on its own CPU copy of the encoder, and torch's global thread
+    count is restored after every encode, so the caller's state is unchanged.
+    """
+
+    def __init__(self,
+                 encoder: torch.nn.Module,
+                 quantize: bool = False,
+                 batch_size: int = 64,
+                 num_threads: Optional[int] = None):
+        """
+        Initialize the wrapper.
+
+        Args:
+            encoder: Presto encoder (e.g. pretrained_model.encoder)
+            quantize: Use dynamic int8 quantization of the Linear layers
+            batch_size: Pixels per forward pass (overridden by autotune)
+            num_threads: Intra-op threads (defaults to torch's current setting)
+        """
+        self.encoder = quantize_encoder(encoder) if quantize else copy.deepcopy(encoder).cpu().eval()
+        self.quantized = quantize
+        self.batch_size = batch_size
+        self.num_threads = num_threads or torch.get_num_threads()
+
+    @staticmethod
+    def _prepare(x, mask, dynamic_world, latlons, month) -> Tuple[torch.Tensor, ...]:
+        """Convert inputs once to contiguous CPU tensors with the encoder's dtypes."""
+        return (torch.as_tensor(x).float().contiguous(),
+                torch.as_tensor(mask).bool().contiguous(),
+                torch.as_tensor(dynamic_world).long().contiguous(),
+                torch.as_tensor(latlons).float().contiguous(),
+                torch.as_tensor(month).long().contiguous())
+
+    def encode(self, x, mask, dynamic_world, latlons, month,
+               batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Encode N pixels into a preallocated (N, embedding_dim) float32 array.
+
+        Args:
+            x, mask, dynamic_world, latlons, month: Presto inputs for N pixels
+            batch_size: Override the configured batch size
+
+        Returns:
+            Embeddings array
+        """
+        batch_size = batch_size or self.batch_size
+        x, mask, dynamic_world, latlons, month = self._prepare(x, mask, dynamic_world, latlons, month)
+        previous_threads = torch.get_num_threads()
+        torch.set_num_threads(self.num_threads)
+
+        out = None
+        try:
+            with torch.inference_mode():
+                for start in range(0, len(x), batch_size):
+                    end = start + batch_size
+                    emb = self.encoder(x[start:end], dynamic_world=dynamic_world[start:end],
+                                       mask=mask[start:end], latlons=latlons[start:end],
+                                       month=month[start:end])
+                    if out is None:
+                        out = np.empty((len(x), emb.shape[-1]), dtype=np.float32)
+                    out[start:end] = emb.numpy()
+        finally:
+            torch.set_num_threads(previous_threads)
+        return out if out is not None else np.empty((0, 0), dtype=np.float32)
+
+    def throughput(self, x, mask, dynamic_world, latlons, month,
+                   batch_size: Optional[int] = None, repeats: int = 3) -> float:
+        """
+        Measure encoder throughput in pixels/second (best of ``repeats``).
+
+        Args:
+            x, mask, dynamic_world, latlons, month: Benchmark inputs
+            batch_size: Override the configured batch size
+            repeats: Timed repetitions after one warm-up pass
+
+        Returns:
+            Pixels per second
+        """
+        inputs = self._prepare(x, mask, dynamic_world, latlons, month)
+        self.encode(*[t[:batch_size or self.batch_size] for t in inputs], batch_size=batch_size)  # warm-up
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            self.encode(*inputs, batch_size=batch_size)
+            best = min(best, time.perf_counter() - start)
+        return len(inputs[0]) / best
+
+    def autotune(self, x, mask, dynamic_world, latlons, month,
+                 batch_sizes: Sequence[int] = (64, 128, 256, 512, 1024, 2048),
+                 thread_counts: Optional[Sequence[int]] = None,
+                 sample_size: int = 4096) -> Dict:
+        """
+        Pick the batch size and thread count with the highest throughput.
+
+        Args:
+            x, mask, dynamic_world, latlons, month: Representative inputs
+            batch_sizes: Candidate batch sizes
+            thread_counts: Candidate intra-op thread counts
+            sample_size: Pixels used for each measurement
+
+        Returns:
+            Dict with the chosen batch_size, num_threads and all measurements
+        """
+        n_cpus = os.cpu_count() or 1
+        thread_counts = thread_counts or sorted({1, max(1, n_cpus // 2), n_cpus})
+        inputs = [t[:sample_size] for t in self._prepare(x, mask, dynamic_world, latlons, month)]
+
+        results: List[Dict] = []
+        for threads in thread_counts:
+            self.num_threads = threads
+            for batch_size in batch_sizes:
+                if batch_size > len(inputs[0]) and batch_size != batch_sizes[0]:
+                    continue
+                pps = self.throughput(*inputs, batch_size=batch_size, repeats=2)
+                results.append({"num_threads": threads, "batch_size": batch_size, "pixels_per_second": pps})
+                logger.info(f"⚙️ threads={threads} batch={batch_size}: {pps:,.0f} pixels/s")
+
+        best = max(results, key=lambda r: r["pixels_per_second"])
+        self.num_threads, self.batch_size = best["num_threads"], best["batch_size"]
+        logger.info(f"✅ Selected threads={self.num_threads} batch={self.batch_size} "
+                    f"({best['pixels_per_second']:,.0f} pixels/s)")
+        return {"batch_size": self.batch_size, "num_threads": self.num_threads, "measurements": results}
+
+
+def quantization_parity_check(encoder: torch.nn.Module,
+                              inputs: Tuple,
+                              labels: np.ndarray,
+                              rf_params: Optional[Dict] = None,
+                              test_size: float = 0.2,
+                              seed: int = 42) -> Dict:
+    """
+    Compare fp32 and int8 encoders on RandomForest log-loss and throughput.
+
+    Both embedding sets are split identically; a RandomForest is trained on
+    each and scored on the held-out part.
+
+    Args:
+        encoder: Presto encoder
+        inputs: (x, mask, dynamic_world, latlons, month) for the pixels
+        labels: (N,) class labels
+        rf_params: RandomForestClassifier parameters
+        test_size: Held-out fraction
+        seed: Random seed for the split and forests
+
+    Returns:
+        Dict with log-loss and pixels/second for both encoders
+    """
+    rf_params = rf_params or {"n_estimators": 300, "n_jobs": -1, "random_state": seed}
+    train_idx, test_idx = train_test_split(
+        np.arange(len(labels)), test_size=test_size, random_state=seed, stratify=labels
+    )
+
+    report = {}
+    for name, quantize in [("fp32", False), ("int8", True)]:
+        runner = PrestoCPUEncoder(encoder, quantize=quantize)
+        runner.autotune(*inputs)
+        start = time.perf_counter()
+        features = runner.encode(*inputs)
+        pps = len(features) / (time.perf_counter() - start)
+
+        model = RandomForestClassifier(**rf_params)
+        model.fit(features[train_idx], labels[train_idx])
+        loss = log_loss(labels[test_idx], model.predict_proba(features[test_idx]), labels=model.classes_)
+        report[name] = {"log_loss": loss, "pixels_per_second": pps,
+                        "batch_size": runner.batch_size, "num_threads": runner.num_threads}
+        logger.info(f"📊 {name}: log-loss {loss:.4f}, {pps:,.0f} pixels/s")
+
+    report["log_loss_delta"] = report["int8"]["log_loss"] - report["fp32"]["log_loss"]
+    report["speedup"] = report["int8"]["pixels_per_second"] / report["fp32"]["pixels_per_second"]
+    return report
@@ -0,0 +1,280 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import rasterio
+import torch
+from pyproj import Transformer
+
+import presto
+
+logger = logging.getLogger(__name__)
+
+STEP = 10  # Dynamic Indexing Strategy: sample every STEP-th row/column
+S2_BANDS = ["red", "nir", "swir16", "swir22", "blue", "green", "rededge1", "rededge2", "rededge3", "nir08"]
+LABEL_MAP = {'rubber': 0, 'cocoa': 1, 'oil': 2}
+MONTH_MAP = {
+    'jan': 0, 'feb': 1, 'mar': 2, 'apr': 3, 'may': 4, 'jun': 5,
+    'jul': 6, 'aug': 7, 'sep': 8, 'oct': 9, 'nov': 10, 'dec': 11
+}
+
+
+class PrestoInputs(NamedTuple):
+    """Model-ready Presto inputs, in the same order as the notebook's process_images."""
+    x: np.ndarray               # (N, T, C) float32, normalized Presto bands
+    mask: np.ndarray            # (N, T, C) bool
+    dynamic_world: np.ndarray   # (N, T) int64
+    latlons: np.ndarray         # (N, 2) float32, [lat, lon]
+    labels: np.ndarray          # (N,) int64
+    image_names: np.ndarray     # (N,) object, source file of each pixel
+    months: np.ndarray          # (N,) int64, month index of the first timestep
+
+    def to_torch(self) -> Tuple:
+        """Return the inputs as tensors, matching process_images' return value."""
+        return (torch.from_numpy(self.x),
+                torch.from_numpy(self.mask),
+                torch.from_numpy(self.dynamic_world),
+                torch.from_numpy(self.latlons),
+                torch.from_numpy(self.labels),
+                list(self.image_names),
+                torch.from_numpy(self.months))
+
+
+class PixelSeriesInputs(NamedTuple):
+    """Dense Presto inputs for full pixel time series, one row per unique_id."""
+    x: np.ndarray               # (N, T, C) float32, normalized Presto bands
+    mask: np.ndarray            # (N, T, C) bool, padding timesteps fully masked
+    dynamic_world: np.ndarray   # (N, T) int64
+    latlons: np.ndarray         # (N, 2) float32, [lat, lon] of the first timestep
+    months: np.ndarray          # (N, T) int64, month index of each timestep
+    unique_ids: np.ndarray      # (N,) object, sorted like groupby("unique_id")
+    n_timesteps: np.ndarray     # (N,) int64, valid timesteps per pixel
+
+    def to_torch(self) -> Tuple:
+        """Return (x, mask, dynamic_world, latlons, months) as tensors."""
+        return (torch.from_numpy(self.x),
+                torch.from_numpy(self.mask),
+                torch.from_numpy(self.dynamic_world),
+                torch.from_numpy(self.latlons),
+                torch.from_numpy(self.months))
+
+
+def build_file_lookup(train_df: pd.DataFrame) -> Dict[str, Tuple[int, int]]:
+    """
+    Build a filename -> (month index, label) dict from the training frame.
+
+    Replaces the per-file ``train_df['tifPath'].str.endswith(...)`` scan.
+    The first row for a file wins, as with ``.iloc[0]``.
+
+    Args:
+        train_df: Frame with tifPath, month and crop_type columns
+
+    Returns:
+        Dict keyed by file basename
+    """
+    lookup = {}
+    for path, month, crop_type in zip(train_df['tifPath'], train_df['month'], train_df['crop_type']):
+        name = Path(path).name
+        if name not in lookup:
+            month_idx = MONTH_MAP.get(str(month).lower(), 0)  # Default to 0 if month is invalid
+            lookup[name] = (month_idx, LABEL_MAP.get(crop_type, -1))  # -1 for unexpected cases
+    return lookup
+
+
+def _grid_shape(path: Path, step: int) -> Tuple[int, int]:
+    """Number of strided rows and columns sampled from a file, read from its header only."""
+    with rasterio.open(path) as src:
+        return len(range(0, src.height, step)), len(range(0, src.width, step))
+
+
+def to_latlons(xs: np.ndarray, ys: np.ndarray, crs) -> np.ndarray:
+    """
+    Reproject pixel-centre coordinates to the [lat, lon] pairs Presto expects.
+
+    Args:
+        xs, ys: Coordinates in ``crs`` (e.g. UTM metres)
+        crs: Source CRS (anything pyproj accepts, including odc.geo CRS)
+
+    Returns:
+        (n, 2) float32 array of [lat, lon] in degrees
+    """
+    transformer = Transformer.from_crs(crs, "EPSG:4326", always_xy=True)
+    lons, lats = transformer.transform(np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64))
+    return np.stack([lats, lons], axis=1).astype(np.float32)
+
+
+def read_strided_pixels(path: Union[str, Path], step: int = STEP) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Read the strided pixel grid of one GeoTIFF and its coordinates.
+
+    Coordinates are those of each sampled pixel's own row and column. This
+    fixes an x/y swap in the notebook's process_images, which looked up
+    ``tif.x`` with the row index and ``tif.y`` with the column index (and
+    capped rows by the width and columns by the height). Band values are
+    unchanged, but latlons differ, and on non-square tiles so does the set
+    of sampled pixels.
+
+    Args:
+        path: GeoTIFF path
+        step: Grid stride in pixels
+
+    Returns:
+        Tuple of (s2 values (n, C) float32, latlons (n, 2) float32)
+    """
+    with rasterio.open(path) as src:
+        values = src.read()[:, ::step, ::step]
+        rows = np.arange(0, src.height, step)
+        cols = np.arange(0, src.width, step)
+        transform, crs = src.transform, src.crs
+
+    # One batched affine + CRS transform for every pixel centre of the grid
+    rr, cc = np.meshgrid(rows + 0.5, cols + 0.5, indexing="ij")
+    xs, ys = transform * (cc.ravel(), rr.ravel())
+
+    # (C, h, w) -> (h * w, C); integer cast mirrors the notebook's .astype(int)
+    s2 = values.reshape(values.shape[0], -1).T.astype(np.int64).astype(np.float32)
+    return s2, to_latlons(xs, ys, crs)
+
+
+def build_presto_inputs(filenames: List[str],
+                        train_df: pd.DataFrame,
+                        data_dir: Optional[Union[str, Path]] = None,
+                        step: int = STEP,
+                        max_workers: Optional[int] = None) -> PrestoInputs:
+    """
+    Vectorized, multi-process replacement for the notebook's process_images.
+
+    File headers are read first to size the outputs, which are then
+    preallocated and filled by file slices read in a process pool. Presto
+    normalization and masking run once over all pixels.
+
+    Latlons follow the corrected row/column lookup of read_strided_pixels,
+    not the notebook's swapped one, so Presto embeddings change: features,
+    caches and submissions built from process_images are not comparable
+    with these and should be regenerated.
+
+    Args:
+        filenames: GeoTIFF paths (relative to data_dir, or absolute)
+        train_df: Frame with tifPath, month and crop_type columns
+        data_dir: Base directory of the GeoTIFFs
+        step: Grid stride in pixels
+        max_workers: Worker processes (defaults to the CPU count)
+
+    Returns:
+        PrestoInputs with T=1
+    """
+    data_dir = Path(data_dir) if data_dir is not None else Path()
+    paths = [data_dir / f.strip() for f in filenames]
+    lookup = build_file_lookup(train_df)
+    max_workers = max_workers or os.cpu_count()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        shapes = list(pool.map(_grid_shape, paths, [step] * len(paths), chunksize=16))
+        counts = np.array([h * w for h, w in shapes], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        n_pixels = int(offsets[-1])
+        logger.info(f"🧮 {len(paths)} files, {n_pixels} pixels (step={step})")
+
+        s2 = np.empty((n_pixels, len(S2_BANDS)), dtype=np.float32)
+        latlons = np.empty((n_pixels, 2), dtype=np.float32)
+        file_idx = np.repeat(np.arange(len(paths)), counts)
+
+        results = pool.map(read_strided_pixels, paths, [step] * len(paths), chunksize=4)
+        for i, (values, coords) in enumerate(results):
+            s2[offsets[i]:offsets[i + 1]] = values
+            latlons[offsets[i]:offsets[i + 1]] = coords
+
+    meta = np.array([lookup[Path(f).name] for f in filenames], dtype=np.int64).reshape(-1, 2)
+    months = meta[file_idx, 0]
+    labels = meta[file_idx, 1]
+
+    # construct_single_presto_input is elementwise over its leading (time)
+    # axis, so all pixels go through it in one call and are then given T=1.
+    x, mask, dynamic_world = presto.construct_single_presto_input(
+        s2=torch.from_numpy(s2), s2_bands=S2_BANDS
+    )
+
+    return PrestoInputs(
+        x=x.numpy().astype(np.float32)[:, None, :],
+        mask=mask.numpy().astype(bool)[:, None, :],
+        dynamic_world=dynamic_world.numpy().astype(np.int64)[:, None],
+        latlons=latlons,
+        labels=labels,
+        image_names=np.asarray(filenames, dtype=object)[file_idx],
+        months=months,
+    )
+
+
+def build_series_inputs(df: pd.DataFrame,
+                        bands: List[str] = S2_BANDS,
+                        max_timesteps: Optional[int] = None,
+                        crs=None) -> PixelSeriesInputs:
+    """
+    Pivot a long pixel/time frame (e.g. test.csv) into dense Presto inputs in one shot.
+
+    Replaces the per-pixel ``groupby("unique_id")`` loop: rows are sorted
+    once, each gets a (pixel, timestep) slot, and all band values are
+    scattered into a preallocated (N, T, C) array. Presto normalization runs
+    once over every slot, and slots past a pixel's last timestep are masked.
+    ``max_timesteps=1`` reproduces the old first-timestep-only inputs.
+
+    Args:
+        df: Frame with unique_id, time, x, y and band columns
+        bands: Band columns, in Presto s2_bands order
+        max_timesteps: Keep at most this many timesteps per pixel
+        crs: CRS of the frame's x/y (extract_pixel_timeseries writes the cube's
+            projected coordinates); when given they are reprojected to degrees
+            like build_presto_inputs' latlons, otherwise used as they are
+
+    Returns:
+        PixelSeriesInputs
+    """
+    df = df[["unique_id", "time", "x", "y"] + list(bands)].copy()
+    df["time"] = pd.to_datetime(df["time"])
+    for band in bands:
+        # Invalid values become 0, as in the notebook
+        df[band] = pd.to_numeric(df[band], errors="coerce").fillna(0)
+    df = df.sort_values(["unique_id", "time"], kind="stable")
+
+    pixel, unique_ids = pd.factorize(df["unique_id"], sort=True)
+    step = df.groupby(pixel, sort=False).cumcount().to_numpy()
+    if max_timesteps is not None:
+        keep = step < max_timesteps
+        df, pixel, step = df[keep], pixel[keep], step[keep]
+
+    n_pixels = len(unique_ids)
+    n_steps = int(step.max()) + 1 if len(step) else 0
+    n_timesteps = np.bincount(pixel, minlength=n_pixels).astype(np.int64)
+
+    s2 = np.zeros((n_pixels, n_steps, len(bands)), dtype=np.float32)
+    s2[pixel, step] = df[list(bands)].to_numpy(dtype=np.float32)
+    months = np.zeros((n_pixels, n_steps), dtype=np.int64)
+    months[pixel, step] = df["time"].dt.month.to_numpy() - 1
+    valid = np.zeros((n_pixels, n_steps), dtype=bool)
+    valid[pixel, step] = True
+
+    first = step == 0
+    latlons = np.zeros((n_pixels, 2), dtype=np.float32)
+    if crs is not None:
+        latlons[pixel[first]] = to_latlons(df.loc[first, "x"].to_numpy(), df.loc[first, "y"].to_numpy(), crs)
+    else:
+        latlons[pixel[first]] = df.loc[first, ["y", "x"]].to_numpy(dtype=np.float32)
+
+    # construct_single_presto_input is elementwise over its leading axis
+    x, mask, dynamic_world = presto.construct_single_presto_input(
+        s2=torch.from_numpy(s2.reshape(-1, len(bands))), s2_bands=list(bands)
+    )
+    x = x.numpy().astype(np.float32).reshape(n_pixels, n_steps, -1)
+    mask = mask.numpy().astype(bool).reshape(n_pixels, n_steps, -1)
+    mask[~valid] = True
+    dynamic_world = dynamic_world.numpy().astype(np.int64).reshape(n_pixels, n_steps)
+
+    logger.info(f"🧮 Built inputs for {n_pixels} pixels x {n_steps} timesteps from {len(df)} rows")
+    return PixelSeriesInputs(
+        x=x, mask=mask, dynamic_world=dynamic_world, latlons=latlons,
+        months=months, unique_ids=np.asarray(unique_ids, dtype=object), n_timesteps=n_timesteps
+    )
@@ -0,0 +1,232 @@
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import rasterio
+import torch
+import xarray as xr
+from odc.geo import Geometry
+
+import presto
+
+from columnar_io import NODATA
+from presto_inputs import S2_BANDS, STEP, PixelSeriesInputs, read_strided_pixels, to_latlons
+from tmp import SatelliteDataProcessor
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def _batch_to_inputs(batch: xr.Dataset,
+                     bands: List[str],
+                     s2_bands: List[str],
+                     n_steps: int,
+                     check_nodata: bool,
+                     crs) -> Optional[PixelSeriesInputs]:
+    """
+    Turn one computed (time, pixel) batch into dense Presto inputs.
+
+    Mirrors build_series_inputs on the frame extract_pixel_timeseries would
+    produce: each pixel keeps its valid timesteps in time order, packed to
+    the front, and padding slots are fully masked. The cube's projected
+    x/y are reprojected from ``crs`` to degrees, as build_presto_inputs does.
+    """
+    values = np.stack([batch[band].transpose("pixel", "time").values for band in bands], axis=-1)
+    values = values.astype(np.float32, copy=False)
+    valid = ~np.isnan(values).any(axis=-1)
+    if "valid" in batch.data_vars:
+        valid &= batch["valid"].transpose("pixel", "time").values.astype(bool)
+    if check_nodata:
+        # Integer loads flag missing data with the nodata value, not NaN
+        valid &= (values != NODATA).all(axis=-1)
+
+    n_valid = valid.sum(axis=1)
+    keep = n_valid > 0
+    if not keep.any():
+        return None
+    values, valid, n_valid = values[keep], valid[keep], n_valid[keep]
+
+    # Stable sort puts valid timesteps first while keeping their time order
+    order = np.argsort(~valid, axis=1, kind="stable")[:, :n_steps]
+    values = np.take_along_axis(values, order[..., None], axis=1)
+    valid = np.take_along_axis(valid, order, axis=1)
+    months = np.take_along_axis(
+        np.broadcast_to(batch["time"].dt.month.values - 1, (len(order), batch.sizes["time"])), order, axis=1
+    ).astype(np.int64)
+
+    if values.shape[1] < n_steps:
+        pad = n_steps - values.shape[1]
+        values = np.pad(values, ((0, 0), (0, pad), (0, 0)))
+        valid = np.pad(valid, ((0, 0), (0, pad)))
+        months = np.pad(months, ((0, 0), (0, pad)))
+    values[~valid] = 0
+    months[~valid] = 0
+
+    n_pixels = len(values)
+    # construct_single_presto_input is elementwise over its leading axis
+    x, mask, dynamic_world = presto.construct_single_presto_input(
+        s2=torch.from_numpy(values.reshape(-1, len(bands))), s2_bands=list(s2_bands)
+    )
+    x = x.numpy().astype(np.float32).reshape(n_pixels, n_steps, -1)
+    mask = mask.numpy().astype(bool).reshape(n_pixels, n_steps, -1)
+    mask[~valid] = True
+    dynamic_world = dynamic_world.numpy().astype(np.int64).reshape(n_pixels, n_steps)
+
+    latlons = to_latlons(batch["x"].values, batch["y"].values, crs)[keep]
+    return PixelSeriesInputs(
+        x=x, mask=mask, dynamic_world=dynamic_world, latlons=latlons, months=months,
+        unique_ids=np.asarray(batch["pixel"].values, dtype=object)[keep],
+        n_timesteps=np.minimum(n_valid, n_steps).astype(np.int64),
+    )
+
+
+def _chunk_order(processor: SatelliteDataProcessor, dataset: xr.Dataset,
+                 ys: np.ndarray, xs: np.ndarray) -> np.ndarray:
+    """
+    Positions of the sampled pixels grouped by the spatial dask chunk they are read from.
+
+    Sampled pixels are scattered over the whole grid, so batches cut in
+    sample order each touch almost every chunk. Grouped, each chunk is read
+    by about one batch. Within a chunk the sample order is kept.
+    """
+    chunks = processor._finest_band(dataset).chunksizes
+    if "y" not in chunks or "x" not in chunks:
+        return np.arange(len(ys))
+    chunk_y = np.searchsorted(np.cumsum(chunks["y"]), ys, side="right")
+    chunk_x = np.searchsorted(np.cumsum(chunks["x"]), xs, side="right")
+    return np.argsort(chunk_y * len(chunks["x"]) + chunk_x, kind="stable")
+
+
+def iter_presto_batches(processor: SatelliteDataProcessor,
+                        dataset: xr.Dataset,
+                        n_samples: int = 300,
+                        batch_size: int = 256,
+                        seed: int = 42,
+                        fields: Optional[Union[Dict, Geometry]] = None,
+                        max_timesteps: Optional[int] = None,
+                        s2_bands: Optional[List[str]] = None,
+                        prefetch: int = 2) -> Iterator[PixelSeriesInputs]:
+    """
+    Stream ready-to-encode Presto batches straight from a loaded S2 cube.
+
+    Pixels are sampled exactly as in extract_pixel_timeseries (same seed,
+    same ids), grouped by the spatial chunk of the cube they fall in, and
+    computed ``batch_size`` pixels at a time in a background thread, so
+    each chunk is read about once and reading the next batch overlaps with
+    encoding the current one. Batches therefore follow chunk order, not
+    sample order; use their unique_ids to match rows. At most ``prefetch``
+    computed batches are held in memory, and nothing is written to or
+    parsed from text.
+
+    Args:
+        processor: Processor that loaded ``dataset``
+        dataset: Output of load_satellite_data (optionally cloud-masked or composited)
+        n_samples: Number of pixels to sample
+        batch_size: Pixels per yielded batch
+        seed: Random seed for the pixel sample
+        fields: Optional field geometry; only pixels inside it are sampled
+        max_timesteps: Timesteps per pixel (defaults to the dataset's time length)
+        s2_bands: Band names passed to Presto (defaults to the processor's bands,
+            as build_series_inputs does)
+        prefetch: Computed batches buffered ahead of the consumer
+
+    Yields:
+        PixelSeriesInputs per batch; pixels without any valid observation are skipped
+    """
+    indices = processor.sample_pixel_indices(dataset, n_samples, seed, fields)
+    if indices is None:
+        return
+    ys, xs = indices
+    crs = processor._finest_band(dataset).odc.crs
+    dataset = dataset[processor.bands + (["valid"] if "valid" in dataset.data_vars else [])]
+    n_steps = max_timesteps or dataset.sizes["time"]
+    s2_bands = s2_bands or processor.bands
+    n_pixels = len(ys)
+    order = _chunk_order(processor, dataset, ys, xs)
+
+    handoff: "queue.Queue" = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+
+    def produce() -> None:
+        try:
+            for start in range(0, n_pixels, batch_size):
+                if stop.is_set():
+                    break
+                # Stack each batch from the cube itself: a batch cut from one
+                # stacked sample would compute the whole sample every time
+                positions = order[start:start + batch_size]
+                batch = processor.stack_pixels(dataset, ys[positions], xs[positions], positions).compute()
+                handoff.put(_batch_to_inputs(batch, processor.bands, s2_bands, n_steps,
+                                             processor.dtype == "uint16", crs))
+        except Exception as e:
+            handoff.put(e)
+        finally:
+            handoff.put(_DONE)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    logger.info(f"🌊 Streaming {n_pixels} pixels in batches of {batch_size} (T={n_steps})")
+
+    try:
+        while True:
+            batch = handoff.get()
+            if batch is _DONE:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            if batch is not None:
+                yield batch
+    finally:
+        stop.set()
+        # Drain so the producer thread is never left blocked on a full queue
+        while thread.is_alive():
+            try:
+                handoff.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+
+def latlon_parity_check(path: Union[str, Path], step: int = STEP) -> Dict[str, float]:
+    """
+    Compare streamed inputs with build_presto_inputs' on the strided grid of one GeoTIFF.
+
+    The GeoTIFF is opened as a one-scene cube with pixel-centre x/y
+    coordinates and its CRS, the same pixels are stacked and turned into
+    inputs by the streaming path, and their latlons and band values are
+    compared with read_strided_pixels (which build_presto_inputs uses).
+
+    Args:
+        path: GeoTIFF with the S2_BANDS bands, as read by build_presto_inputs
+        step: Grid stride in pixels
+
+    Returns:
+        Dict with the largest latlon difference in degrees and band difference
+    """
+    with rasterio.open(path) as src:
+        values = src.read()
+        transform, crs = src.transform, src.crs
+    rows, cols = np.arange(values.shape[1]), np.arange(values.shape[2])
+    cube = xr.Dataset(
+        {band: (("time", "y", "x"), values[i][None].astype(np.float32)) for i, band in enumerate(S2_BANDS)},
+        coords={"time": [np.datetime64("2024-01-01")],
+                "y": transform.f + (rows + 0.5) * transform.e,
+                "x": transform.c + (cols + 0.5) * transform.a},
+    )
+
+    rr, cc = np.meshgrid(rows[::step], cols[::step], indexing="ij")
+    processor = SatelliteDataProcessor(bands=list(S2_BANDS))
+    stacked = processor.stack_pixels(cube, rr.ravel(), cc.ravel())
+    streamed = _batch_to_inputs(stacked, list(S2_BANDS), list(S2_BANDS), 1, False, crs)
+
+    s2, latlons = read_strided_pixels(path, step)
+    x, _, _ = presto.construct_single_presto_input(s2=torch.from_numpy(s2), s2_bands=S2_BANDS)
+    report = {
+        "max_latlon_diff_deg": float(np.abs(streamed.latlons - latlons).max()),
+        "max_input_diff": float(np.abs(streamed.x[:, 0] - x.numpy()).max()),
+    }
+    logger.info(f"📐 Streaming vs build_presto_inputs: {report}")
+    return report
@@ -0,0 +1,157 @@
+import logging
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import log_loss
+from sklearn.model_selection import train_test_split
+
+from presto_inference import PrestoCPUEncoder
+
+logger = logging.getLogger(__name__)
+
+BAND_TOLERANCE = 0.002   # Quantization step on normalized Presto bands (~20 reflectance DN)
+LATLON_PRECISION = 0.01  # Quantization step on coordinates, in degrees (~1 km)
+
+
+def _to_numpy(array) -> np.ndarray:
+    return array.detach().cpu().numpy() if isinstance(array, torch.Tensor) else np.asarray(array)
+
+
+def spectral_keys(x, mask, dynamic_world, latlons, month,
+                  band_tolerance: float = BAND_TOLERANCE,
+                  latlon_precision: Optional[float] = LATLON_PRECISION) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group pixels whose quantized encoder inputs are identical.
+
+    Band values are rounded to multiples of ``band_tolerance`` (masked
+    values are ignored, since the encoder drops masked tokens), latlons are
+    floored to a ``latlon_precision`` grid, and dynamic world, mask and month
+    are compared exactly. ``band_tolerance=0`` only merges exact duplicates;
+    ``latlon_precision=None`` drops location from the key.
+
+    Args:
+        x: (N, T, C) normalized bands
+        mask: (N, T, C) mask
+        dynamic_world: (N, T) dynamic world classes
+        latlons: (N, 2) coordinates
+        month: (N,) or (N, T) month indices
+
+    Returns:
+        (representatives, inverse): index of one pixel per group, and the
+        group of every pixel, so that ``pixels == representatives[inverse]``
+        holds group-wise
+    """
+    x, mask = _to_numpy(x), _to_numpy(mask).astype(bool)
+    n = len(x)
+    bands = np.where(mask, 0.0, x).reshape(n, -1)
+    if band_tolerance > 0:
+        bands = np.round(bands / band_tolerance)
+    parts = [
+        bands.astype(np.int64) if band_tolerance > 0 else bands.astype(np.float32).view(np.int32),
+        mask.reshape(n, -1),
+        _to_numpy(dynamic_world).reshape(n, -1),
+        _to_numpy(month).reshape(n, -1),
+    ]
+    if latlon_precision is not None:
+        parts.append(np.floor(_to_numpy(latlons) / latlon_precision))
+    key = np.ascontiguousarray(np.concatenate([p.astype(np.int64) for p in parts], axis=1))
+
+    # One opaque bytes value per row makes np.unique a single 1-D sort
+    rows = key.view(np.dtype((np.void, key.dtype.itemsize * key.shape[1]))).ravel()
+    _, representatives, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    return representatives, inverse.ravel()
+
+
+def encode_deduplicated(encoder, x, mask, dynamic_world, latlons, month,
+                        band_tolerance: float = BAND_TOLERANCE,
+                        latlon_precision: Optional[float] = LATLON_PRECISION,
+                        batch_size: int = 256) -> Tuple[np.ndarray, Dict]:
+    """
+    Encode one representative per spectral key and scatter embeddings back.
+
+    Args:
+        encoder: Presto encoder (e.g. pretrained_model.encoder) or PrestoCPUEncoder
+        x, mask, dynamic_world, latlons, month: Presto inputs for N pixels
+        band_tolerance: See spectral_keys
+        latlon_precision: See spectral_keys
+        batch_size: Encoder batch size
+
+    Returns:
+        (N, embedding_dim) embeddings and a stats dict with the dedup ratio
+    """
+    runner = encoder if isinstance(encoder, PrestoCPUEncoder) else PrestoCPUEncoder(encoder, batch_size=batch_size)
+    inputs = [_to_numpy(t) for t in (x, mask, dynamic_world, latlons, month)]
+    representatives, inverse = spectral_keys(*inputs, band_tolerance=band_tolerance,
+                                             latlon_precision=latlon_precision)
+
+    start = time.perf_counter()
+    unique_embeddings = runner.encode(*[t[representatives] for t in inputs])
+    elapsed = time.perf_counter() - start
+
+    n_pixels, n_unique = len(inverse), len(representatives)
+    stats = {
+        "n_pixels": n_pixels,
+        "n_encoded": n_unique,
+        "dedup_ratio": n_pixels / max(n_unique, 1),
+        "encode_s": elapsed,
+    }
+    logger.info(f"🧬 Encoded {n_unique} unique keys for {n_pixels} pixels "
+                f"({stats['dedup_ratio']:.1f}x fewer forward passes)")
+    return unique_embeddings[inverse], stats
+
+
+def dedup_accuracy_impact(encoder,
+                          inputs: Tuple,
+                          labels: np.ndarray,
+                          tolerances: Sequence[float] = (0.0, 0.001, 0.002, 0.005, 0.01),
+                          latlon_precision: Optional[float] = LATLON_PRECISION,
+                          rf_params: Optional[Dict] = None,
+                          test_size: float = 0.2,
+                          seed: int = 42) -> Dict:
+    """
+    Compare RandomForest log-loss on exact and deduplicated embeddings.
+
+    The reference run encodes every pixel; each tolerance then encodes only
+    unique keys. All runs share the same stratified split and forest seed.
+
+    Args:
+        encoder: Presto encoder
+        inputs: (x, mask, dynamic_world, latlons, month) for the pixels
+        labels: (N,) class labels
+        tolerances: Band tolerances to evaluate
+        latlon_precision: See spectral_keys
+        rf_params: RandomForestClassifier parameters
+        test_size: Held-out fraction
+        seed: Random seed for the split and forests
+
+    Returns:
+        Dict with the reference log-loss and, per tolerance, dedup ratio,
+        encode time and log-loss delta
+    """
+    rf_params = rf_params or {"n_estimators": 300, "n_jobs": -1, "random_state": seed}
+    train_idx, test_idx = train_test_split(
+        np.arange(len(labels)), test_size=test_size, random_state=seed, stratify=labels
+    )
+    runner = PrestoCPUEncoder(encoder)
+
+    def score(features: np.ndarray) -> float:
+        model = RandomForestClassifier(**rf_params)
+        model.fit(features[train_idx], labels[train_idx])
+        return log_loss(labels[test_idx], model.predict_proba(features[test_idx]), labels=model.classes_)
+
+    start = time.perf_counter()
+    reference = runner.encode(*inputs)
+    report = {"reference": {"log_loss": score(reference), "encode_s": time.perf_counter() - start}}
+
+    for tolerance in tolerances:
+        features, stats = encode_deduplicated(runner, *inputs, band_tolerance=tolerance,
+                                              latlon_precision=latlon_precision)
+        loss = score(features)
+        report[tolerance] = {**stats, "log_loss": loss,
+                             "log_loss_delta": loss - report["reference"]["log_loss"]}
+        logger.info(f"📊 tolerance={tolerance}: {stats['dedup_ratio']:.1f}x, "
+                    f"log-loss delta {report[tolerance]['log_loss_delta']:+.4f}")
+    return report
@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import queue
+import threading
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pystac_client import Client
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+_WINDOW_DONE = object()
+
+
+def split_date_range(date_range: str, window_days: int = 90) -> List[str]:
+    """
+    Split a STAC datetime range into consecutive sub-windows.
+
+    Args:
+        date_range: Date range string (e.g., "2019-01-01/2022-12-31")
+        window_days: Length of each sub-window in days
+
+    Returns:
+        List of "start/end" date range strings covering the full range
+    """
+    if window_days < 1:
+        raise ValueError("window_days must be >= 1")
+
+    start_str, end_str = date_range.split("/")
+    start = date.fromisoformat(start_str[:10])
+    end = date.fromisoformat(end_str[:10])
+    if end < start:
+        raise ValueError(f"Invalid date range: {date_range}")
+
+    windows = []
+    current = start
+    while current <= end:
+        window_end = min(current + timedelta(days=window_days - 1), end)
+        windows.append(f"{current.isoformat()}/{window_end.isoformat()}")
+        current = window_end + timedelta(days=1)
+    return windows
+
+
+class ConcurrentStacSearch:
+    """
+    Date-partitioned STAC search running the per-window paginated searches
+    concurrently with asyncio, under a connection limit.
+
+    Items are deduplicated by id across windows and streamed in date-window
+    order: pages of the earliest unfinished window are passed on as soon as
+    they arrive, and pages of later windows are held back until every
+    earlier window has finished. The item order, and so the cut made by
+    ``max_items``, does not depend on which request returns first.
+
+    A failing window is retried from its first page; if it still fails,
+    iteration raises, unless ``allow_partial`` is set, in which case the
+    window is skipped with a warning.
+    """
+
+    def __init__(self,
+                 client: Client,
+                 collection: str = "sentinel-2-l2a",
+                 window_days: int = 90,
+                 max_concurrency: int = 4,
+                 page_size: int = 100,
+                 max_retries: int = 2,
+                 retry_delay: float = 1.0,
+                 allow_partial: bool = False):
+        """
+        Initialize the search layer.
+
+        Args:
+            client: Opened pystac_client Client
+            collection: Satellite collection name
+            window_days: Length of each date sub-window in days
+            max_concurrency: Maximum number of in-flight page requests
+            page_size: Items requested per page
+            max_retries: Retries of a failed window (backoff doubles from retry_delay)
+            retry_delay: Seconds before the first retry
+            allow_partial: Skip windows that still fail instead of raising
+        """
+        self.client = client
+        self.collection = collection
+        self.window_days = window_days
+        self.max_concurrency = max_concurrency
+        self.page_size = page_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.allow_partial = allow_partial
+        self.stats: Dict[str, int] = {}
+        self._stop = threading.Event()
+
+    async def _search_window(self,
+                             index: int,
+                             window: str,
+                             geometry: Dict,
+                             query: Dict,
+                             semaphore: asyncio.Semaphore,
+                             out: asyncio.Queue) -> None:
+        """
+        Search one date window with retries, then push its end marker.
+
+        Pages are pushed as (index, page); the window ends with
+        (index, _WINDOW_DONE) or (index, exception) once retries are exhausted.
+        A retry starts again from the first page; repeated items are dropped
+        by id downstream.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._page_window(index, window, geometry, query, semaphore, out)
+                await out.put((index, _WINDOW_DONE))
+                return
+            except Exception as e:
+                if attempt == self.max_retries or self._stop.is_set():
+                    await out.put((index, e))
+                    return
+                self.stats["retries"] += 1
+                delay = self.retry_delay * 2 ** attempt
+                logger.warning(f"⚠️ Search failed for window {window} ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _page_window(self,
+                           index: int,
+                           window: str,
+                           geometry: Dict,
+                           query: Dict,
+                           semaphore: asyncio.Semaphore,
+                           out: asyncio.Queue) -> None:
+        """Page through one date window, pushing each page to the output queue."""
+        search = self.client.search(
+            collections=[self.collection],
+            intersects=geometry,
+            datetime=window,
+            query=query,
+            limit=self.page_size
+        )
+        pages = search.pages()
+        while not self._stop.is_set():
+            # The blocking HTTP request runs in a worker thread; the semaphore
+            # caps how many of them are open at once across all windows.
+            async with semaphore:
+                page = await asyncio.to_thread(next, pages, None)
+            if page is None:
+                break
+            self.stats["pages"] += 1
+            await out.put((index, list(page)))
+
+    async def _run(self,
+                   windows: List[str],
+                   geometry: Dict,
+                   query: Dict,
+                   out: asyncio.Queue) -> None:
+        """Run all window searches concurrently, then signal completion."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.gather(
+                *(self._search_window(i, w, geometry, query, semaphore, out) for i, w in enumerate(windows))
+            )
+        finally:
+            await out.put(_DONE)
+
+    def iter_items(self,
+                   geometry: Dict,
+                   date_range: str,
+                   query: Optional[Dict] = None,
+                   max_items: Optional[int] = None) -> Iterator:
+        """
+        Stream unique items for the date range as their pages arrive.
+
+        The event loop runs in a background thread so the generator can be
+        consumed directly by synchronous code such as ``odc.stac.load``.
+
+        Args:
+            geometry: GeoJSON geometry
+            date_range: Date range string (e.g., "2020-01-01/2020-12-31")
+            query: Optional STAC query filter
+            max_items: Stop after this many unique items (the earliest windows' items)
+
+        Yields:
+            pystac.Item objects, without duplicates, in date-window order
+
+        Raises:
+            RuntimeError: A window still failed after its retries (unless allow_partial)
+        """
+        windows = split_date_range(date_range, self.window_days)
+        self.stats = {"windows": len(windows), "pages": 0, "items": 0,
+                      "duplicates": 0, "retries": 0, "failed_windows": 0}
+        self._stop.clear()
+        logger.info(f"🔍 Searching {len(windows)} windows with concurrency {self.max_concurrency}")
+
+        handoff: "queue.Queue" = queue.Queue(maxsize=self.max_concurrency * 2)
+
+        async def pump() -> None:
+            out: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrency * 2)
+            runner = asyncio.create_task(self._run(windows, geometry, query or {}, out))
+            while True:
+                page = await out.get()
+                await asyncio.to_thread(handoff.put, page)
+                if page is _DONE:
+                    break
+            await runner
+
+        thread = threading.Thread(target=asyncio.run, args=(pump(),), daemon=True)
+        thread.start()
+
+        seen = set()
+        pending: Dict[int, List[List]] = {}  # Pages of windows not yet reached, by window index
+        ended: Dict[int, object] = {}  # Window index -> _WINDOW_DONE or its final exception
+        head = 0  # Earliest window whose items are not all yielded yet
+        try:
+            while True:
+                message = handoff.get()
+                if message is _DONE:
+                    break
+                index, page = message
+                if isinstance(page, list):
+                    pending.setdefault(index, []).append(page)
+                else:
+                    ended[index] = page
+
+                # Yield whatever is now next in window order
+                while head < len(windows):
+                    for page in pending.pop(head, []):
+                        for item in page:
+                            if item.id in seen:
+                                self.stats["duplicates"] += 1
+                                continue
+                            seen.add(item.id)
+                            self.stats["items"] += 1
+                            yield item
+                            if max_items is not None and self.stats["items"] >= max_items:
+                                return
+                    if head not in ended:
+                        break
+                    outcome = ended.pop(head)
+                    if outcome is not _WINDOW_DONE:
+                        self.stats["failed_windows"] += 1
+                        if not self.allow_partial:
+                            raise RuntimeError(
+                                f"STAC search failed for window {windows[head]} "
+                                f"after {self.max_retries + 1} attempts: {outcome}"
+                            ) from outcome
+                        logger.warning(f"⚠️ Skipping window {windows[head]} after {self.max_retries + 1} "
+                                       f"failed attempts: {outcome}")
+                    head += 1
+        finally:
+            self._stop.set()
+            # Drain so the producer thread is never left blocked on a full queue
+            if thread.is_alive():
+                threading.Thread(target=self._drain, args=(handoff, thread), daemon=True).start()
+
+    @staticmethod
+    def _drain(handoff: "queue.Queue", thread: threading.Thread) -> None:
+        """Consume and discard remaining pages until the producer finishes."""
+        while thread.is_alive() or not handoff.empty():
+            try:
+                if handoff.get(timeout=0.5) is _DONE:
+                    return
+            except queue.Empty:
+                continue
+
+    def search(self,
+               geometry: Dict,
+               date_range: str,
+               query: Optional[Dict] = None,
+               max_items: Optional[int] = None) -> Tuple[List, Dict[str, int]]:
+        """
+        Collect all unique items for the date range.
+
+        Args:
+            geometry: GeoJSON geometry
+            date_range: Date range string
+            query: Optional STAC query filter
+            max_items: Maximum items to return
+
+        Returns:
+            Tuple of (items, stats)
+        """
+        items = list(self.iter_items(geometry, date_range, query, max_items))
+        return items, dict(self.stats)
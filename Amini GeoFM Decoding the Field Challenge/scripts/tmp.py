@@ -2,17 +2,28 @@ import numpy as np
 import pandas as pd
 import geopandas as gpd
 import xarray as xr
+import pyarrow.dataset as pads
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 import logging
 from datetime import datetime
 import warnings
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import tempfile
 import time
+import numbers
+from itertools import chain, islice
 
 from pystac_client import Client
+from pystac import ItemCollection
 from odc.stac import load
 from odc.geo import Geometry
+from odc.geo.xr import rasterize
+
+from stac_search import ConcurrentStacSearch
+from columnar_io import (NODATA, clear_dataset, combine_and_shuffle, move_into_dataset, open_combined,
+                         write_partitioned_parquet)
+from field_labels import label_pixels
 
 # Configure logging
 logging.basicConfig(
@@ -23,6 +34,20 @@ logger = logging.getLogger(__name__)
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore', category=UserWarning)
+# Fully cloud-masked pixels are expected to have all-NaN composite periods
+warnings.filterwarnings('ignore', message='All-NaN slice encountered', category=RuntimeWarning)
+
+# Sentinel-2 Scene Classification (SCL) classes treated as invalid pixels:
+# 0 no data, 1 saturated/defective, 3 cloud shadow, 8-9 cloud, 10 thin cirrus
+SCL_INVALID_CLASSES = [0, 1, 3, 8, 9, 10]
+
+# Native ground sampling distance (m) of the Earth Search Sentinel-2 L2A assets
+NATIVE_RESOLUTION = {
+    "blue": 10, "green": 10, "red": 10, "nir": 10,
+    "rededge1": 20, "rededge2": 20, "rededge3": 20, "nir08": 20,
+    "swir16": 20, "swir22": 20, "scl": 20,
+    "coastal": 60, "nir09": 60,
+}
 
 class SatelliteDataProcessor:
     """
@@ -33,7 +58,13 @@ class SatelliteDataProcessor:
     def __init__(self, 
                  stac_url: str = "https://earth-search.aws.element84.com/v1",
                  collection: str = "sentinel-2-l2a",
-                 bands: List[str] = None):
+                 bands: List[str] = None,
+                 cloud_mask: bool = False,
+                 scl_invalid_classes: List[int] = None,
+                 output_format: str = "csv",
+                 composite_period: Optional[str] = None,
+                 composite_statistic: Union[str, float] = "median",
+                 native_resolution: bool = False):
         """
         Initialize the processor.
         
@@ -41,12 +72,49 @@ class SatelliteDataProcessor:
             stac_url: STAC API endpoint
             collection: Satellite collection name
             bands: List of bands to extract
+            cloud_mask: Load the SCL band and mask cloudy/shadow pixels lazily
+            scl_invalid_classes: SCL classes treated as invalid when masking
+            output_format: "csv", or "parquet" for a partitioned dataset with
+                native uint16 reflectance and dictionary-encoded ids/labels
+            composite_period: Optional pandas frequency (e.g. "1MS" for monthly,
+                "QS", "14D"); scenes are lazily composited per period
+            composite_statistic: "median", "mean" or a quantile in [0, 1]
+            native_resolution: Load each band group on its native grid (10 m
+                bands on y/x, 20 m bands on y_20/x_20, ...) instead of
+                resampling every band to 10 m
         """
+        if output_format not in ("csv", "parquet"):
+            raise ValueError(f"Unsupported output format: {output_format}")
+        if not (composite_statistic in ("median", "mean") or
+                (isinstance(composite_statistic, numbers.Real) and not isinstance(composite_statistic, bool)
+                 and 0 <= composite_statistic <= 1)):
+            raise ValueError(f"Unsupported composite statistic: {composite_statistic}")
         self.stac_url = stac_url
         self.collection = collection
         self.bands = bands or ['red', 'nir', 'swir16', 'swir22', 'blue', 'green', 
                               'rededge1', 'rededge2', 'rededge3', 'nir08']
+        self.cloud_mask = cloud_mask
+        self.scl_invalid_classes = scl_invalid_classes or SCL_INVALID_CLASSES
+        self.output_format = output_format
+        self.composite_period = composite_period
+        self.composite_statistic = composite_statistic
+        self.native_resolution = native_resolution
+        # Parquet output keeps Sentinel-2 digital numbers instead of float32
+        self.dtype = "uint16" if output_format == "parquet" else "float32"
         self.client = None
+        self.stats = {}
+        # Kept so worker processes can rebuild an equivalent processor
+        self._init_kwargs = {
+            "stac_url": stac_url,
+            "collection": collection,
+            "bands": list(self.bands),
+            "cloud_mask": cloud_mask,
+            "scl_invalid_classes": scl_invalid_classes,
+            "output_format": output_format,
+            "composite_period": composite_period,
+            "composite_statistic": composite_statistic,
+            "native_resolution": native_resolution,
+        }
         
     def _initialize_client(self) -> None:
         """Initialize STAC client with retry logic."""
@@ -62,15 +130,15 @@ class SatelliteDataProcessor:
                     raise ConnectionError(f"Failed to connect to STAC API after {max_retries} attempts")
                 time.sleep(2 ** attempt)  # Exponential backoff
     
-    def extract_bbox_from_geojson(self, geojson_path: Union[str, Path]) -> Optional[Dict]:
+    def read_field_geometries(self, geojson_path: Union[str, Path]) -> Optional[gpd.GeoDataFrame]:
         """
-        Extract bounding box from GeoJSON file with robust error handling.
+        Read and validate the field polygons of a GeoJSON file.
         
         Args:
             geojson_path: Path to GeoJSON file
             
         Returns:
-            GeoJSON-style polygon dict or None if invalid
+            GeoDataFrame of valid polygons in EPSG:4326, or None if invalid
         """
         try:
             geojson_path = Path(geojson_path)
@@ -107,36 +175,97 @@ class SatelliteDataProcessor:
                 logger.info(f"🔄 Converting from {gdf.crs} to EPSG:4326")
                 gdf = gdf.to_crs("EPSG:4326")
             
-            # Calculate bounding box
-            minx, miny, maxx, maxy = gdf.total_bounds
-            
             # Validate bounds
+            minx, miny, maxx, maxy = gdf.total_bounds
             if not (-180 <= minx <= 180 and -180 <= maxx <= 180 and 
                    -90 <= miny <= 90 and -90 <= maxy <= 90):
                 logger.error("❌ Invalid coordinate bounds")
                 return None
             
-            bbox_geometry = {
-                "type": "Polygon",
-                "coordinates": [[
-                    [minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]
-                ]]
-            }
-            
-            area = (maxx - minx) * (maxy - miny)
-            logger.info(f"📐 Bounding box area: {area:.6f} degrees² ({valid_count} geometries)")
-            
-            return bbox_geometry
+            return gdf
             
         except Exception as e:
             logger.error(f"❌ Error processing GeoJSON {geojson_path}: {e}")
             return None
     
+    @staticmethod
+    def _bbox_polygon(bounds) -> Dict:
+        """GeoJSON polygon for a (minx, miny, maxx, maxy) box."""
+        minx, miny, maxx, maxy = bounds
+        return {
+            "type": "Polygon",
+            "coordinates": [[
+                [minx, miny], [maxx, miny], [maxx, maxy], [minx, maxy], [minx, miny]
+            ]]
+        }
+    
+    def extract_bbox_from_geojson(self, geojson_path: Union[str, Path]) -> Optional[Dict]:
+        """
+        Extract bounding box from GeoJSON file with robust error handling.
+        
+        Args:
+            geojson_path: Path to GeoJSON file
+            
+        Returns:
+            GeoJSON-style polygon dict or None if invalid
+        """
+        gdf = self.read_field_geometries(geojson_path)
+        if gdf is None:
+            return None
+        
+        # Calculate bounding box
+        minx, miny, maxx, maxy = gdf.total_bounds
+        bbox_geometry = self._bbox_polygon((minx, miny, maxx, maxy))
+        
+        area = (maxx - minx) * (maxy - miny)
+        logger.info(f"📐 Bounding box area: {area:.6f} degrees² ({len(gdf)} geometries)")
+        
+        return bbox_geometry
+    
+    def cluster_field_windows(self, fields: gpd.GeoDataFrame, max_gap_m: float = 500.0) -> List[Dict]:
+        """
+        Group nearby field polygons into loading windows.
+        
+        Fields closer than ``max_gap_m`` to each other share a window, so
+        scattered fields no longer force one region-wide bounding box.
+        
+        Args:
+            fields: Field polygons in EPSG:4326 (from read_field_geometries)
+            max_gap_m: Maximum gap, in metres, between fields of one window
+            
+        Returns:
+            List of dicts with the window ``bbox`` polygon, the ``fields``
+            geometry (union of the window's polygons) and ``n_fields``
+        """
+        metric = fields.to_crs(fields.estimate_utm_crs())
+        merged = gpd.GeoDataFrame(
+            geometry=[metric.buffer(max_gap_m / 2).union_all()], crs=metric.crs
+        ).explode(index_parts=False).reset_index(drop=True)
+        
+        # Each field joins the merged blob its buffered outline fell into
+        joined = gpd.sjoin(metric[["geometry"]], merged, how="left", predicate="intersects")
+        cluster = joined.groupby(level=0)["index_right"].first().reindex(range(len(fields))).to_numpy()
+        
+        windows = []
+        fields = fields.reset_index(drop=True)
+        for cluster_id in np.unique(cluster):
+            members = fields[cluster == cluster_id]
+            windows.append({
+                "bbox": self._bbox_polygon(members.total_bounds),
+                "fields": members.geometry.union_all().__geo_interface__,
+                "n_fields": len(members),
+            })
+        logger.info(f"🧩 Grouped {len(fields)} fields into {len(windows)} windows (max gap {max_gap_m:.0f} m)")
+        return windows
+    
     def search_satellite_data(self, 
                             geometry: Dict,
                             date_range: str,
                             max_items: int = 500,
-                            cloud_cover_max: float = 20.0) -> Tuple[Optional[List], Optional[object]]:
+                            cloud_cover_max: float = 20.0,
+                            concurrent: bool = False,
+                            window_days: int = 90,
+                            max_concurrency: int = 4) -> Tuple[Optional[List], Optional[object]]:
         """
         Search satellite data with robust error handling.
         
@@ -145,9 +274,14 @@ class SatelliteDataProcessor:
             date_range: Date range string (e.g., "2020-01-01/2020-01-31")
             max_items: Maximum items to return
             cloud_cover_max: Maximum cloud cover percentage
+            concurrent: Split the date range into windows searched concurrently
+            window_days: Length of each date window in concurrent mode
+            max_concurrency: Maximum in-flight page requests in concurrent mode
             
         Returns:
-            Tuple of (items, search_object) or (None, None) if failed
+            Tuple of (items, search_object) or (None, None) if failed. In
+            concurrent mode both are the same one-shot iterator that keeps
+            yielding items while later pages are still being fetched
         """
         try:
             if self.client is None:
@@ -157,30 +291,39 @@ class SatelliteDataProcessor:
             
             logger.info(f"🔍 Searching {self.collection} for {date_range} (cloud cover ≤ {cloud_cover_max}%)")
             
-            search = self.client.search(
-                collections=[self.collection],
-                intersects=geometry,
-                datetime=date_range,
-                query=query,
-                max_items=max_items
-            )
-            
-            items = search.item_collection()
+            if concurrent:
+                searcher = ConcurrentStacSearch(
+                    self.client,
+                    collection=self.collection,
+                    window_days=window_days,
+                    max_concurrency=max_concurrency
+                )
+                # Peek at the first items only; the rest keeps streaming into the loader
+                stream = searcher.iter_items(geometry, date_range, query=query, max_items=max_items)
+                head = list(islice(stream, 5))
+                if not head:
+                    logger.warning("⚠️ No items found for the given criteria")
+                    return None, None
+                self._check_bands(head)
+                items = search = chain(head, stream)
+                logger.info("📦 Streaming items to the loader as search pages arrive")
+                return items, search
+            else:
+                search = self.client.search(
+                    collections=[self.collection],
+                    intersects=geometry,
+                    datetime=date_range,
+                    query=query,
+                    max_items=max_items
+                )
+                
+                items = search.item_collection()
             
             if not items:
                 logger.warning("⚠️ No items found for the given criteria")
                 return None, None
             
-            # Validate available bands
-            available_bands = set()
-            for item in items[:5]:  # Check first 5 items
-                available_bands.update(item.assets.keys())
-            
-            missing_bands = set(self.bands) - available_bands
-            if missing_bands:
-                logger.warning(f"⚠️ Missing bands: {missing_bands}")
-                self.bands = [b for b in self.bands if b in available_bands]
-                logger.info(f"📊 Using available bands: {self.bands}")
+            self._check_bands(items[:5])  # Check first 5 items
             
             logger.info(f"📦 Found {len(items)} items")
             return items, search
@@ -189,17 +332,32 @@ class SatelliteDataProcessor:
             logger.error(f"❌ Error searching satellite data: {e}")
             return None, None
     
+    def _check_bands(self, items: List):
+        """Drop requested bands that none of ``items`` provides."""
+        available_bands = set()
+        for item in items:
+            available_bands.update(item.assets.keys())
+        
+        missing_bands = set(self.bands) - available_bands
+        if missing_bands:
+            logger.warning(f"⚠️ Missing bands: {missing_bands}")
+            self.bands = [b for b in self.bands if b in available_bands]
+            logger.info(f"📊 Using available bands: {self.bands}")
+    
     def load_satellite_data(self, 
                           search_results: object,
                           geometry: Dict,
-                          chunk_size: int = 2048) -> Optional[xr.Dataset]:
+                          chunk_size: int = 2048,
+                          date_range: Optional[str] = None) -> Optional[xr.Dataset]:
         """
         Load satellite data with optimized chunking and error handling.
         
         Args:
-            search_results: Search results from STAC
+            search_results: Search results from STAC, or an iterable of items
             geometry: GeoJSON geometry for clipping
             chunk_size: Chunk size for Dask arrays
+            date_range: Searched date range; fixes the composite periods
+                (see composite_temporal)
             
         Returns:
             xarray Dataset or None if failed
@@ -214,21 +372,37 @@ class SatelliteDataProcessor:
             # Optimized loading with chunking
             chunks = {"time": 1, "y": chunk_size, "x": chunk_size}
             
-            data = load(
-                search_results.items(),
-                geopolygon=geometry,
-                groupby="solar_day",
-                chunks=chunks,
-                bands=self.bands,
-                resolution=10,  # 10m resolution for Sentinel-2
-                resampling="bilinear",
-                dtype="float32"  # Optimize memory usage
-            )
+            # ItemSearch exposes items() while ItemCollection/generators are iterated directly
+            items = search_results.items() if callable(getattr(search_results, "items", None)) else search_results
+            
+            # SCL is categorical, so it must never be interpolated
+            bands = self.bands + ["scl"] if self.cloud_mask else self.bands
+            resampling = {"*": "bilinear", "scl": "nearest"} if self.cloud_mask else "bilinear"
+            
+            if self.native_resolution:
+                data = self._load_native_groups(list(items), geometry, bands, resampling, chunk_size)
+            else:
+                data = load(
+                    items,
+                    geopolygon=geometry,
+                    groupby="solar_day",
+                    chunks=chunks,
+                    bands=bands,
+                    resolution=10,  # 10m resolution for Sentinel-2
+                    resampling=resampling,
+                    dtype=self.dtype  # Optimize memory usage
+                )
             
             if data is None or len(data.data_vars) == 0:
                 logger.error("❌ No data loaded")
                 return None
             
+            if self.cloud_mask:
+                data = self.apply_cloud_mask(data)
+            
+            if self.composite_period:
+                data = self.composite_temporal(data, date_range)
+            
             # Validate data
             total_pixels = data.sizes.get('x', 0) * data.sizes.get('y', 0)
             if total_pixels == 0:
@@ -244,11 +418,332 @@ class SatelliteDataProcessor:
             logger.error(f"❌ Error loading satellite data: {e}")
             return None
     
+    def _load_native_groups(self,
+                            items: List,
+                            geometry: Geometry,
+                            bands: List[str],
+                            resampling: Union[str, Dict],
+                            chunk_size: int) -> xr.Dataset:
+        """
+        Load each band group at its native resolution into one dataset.
+        
+        The finest group keeps the ``y``/``x`` dims; coarser groups use
+        ``y_<res>``/``x_<res>``, with chunks scaled so every group's chunk
+        covers the same ground area.
+        """
+        groups: Dict[int, List[str]] = {}
+        for band in bands:
+            groups.setdefault(NATIVE_RESOLUTION.get(band, 10), []).append(band)
+        finest = min(groups)
+        
+        parts = []
+        for resolution, group in sorted(groups.items()):
+            size = max(1, chunk_size * finest // resolution)
+            part = load(
+                items,
+                geopolygon=geometry,
+                groupby="solar_day",
+                chunks={"time": 1, "y": size, "x": size},
+                bands=group,
+                resolution=resolution,
+                resampling=resampling,
+                dtype=self.dtype
+            )
+            if resolution != finest:
+                part = part.drop_vars("spatial_ref", errors="ignore").rename(
+                    {"y": f"y_{resolution}", "x": f"x_{resolution}"}
+                )
+            parts.append(part)
+            logger.info(f"🔬 {resolution} m group {group}: {part[group[0]].shape[-2:]} pixels")
+        
+        return xr.merge(parts, join="exact", combine_attrs="override")
+    
+    @staticmethod
+    def _spatial_dims(array: xr.DataArray) -> Tuple[str, str]:
+        """Names of the (y, x) dims of a variable, e.g. ("y_20", "x_20") for 20 m bands."""
+        return (next(d for d in array.dims if d.startswith("y")),
+                next(d for d in array.dims if d.startswith("x")))
+    
+    def _finest_band(self, data: xr.Dataset) -> xr.DataArray:
+        """A band on the dataset's main ``y``/``x`` grid."""
+        return next(data[band] for band in self.bands if "y" in data[band].dims)
+    
+    def _match_grid(self, mask: xr.DataArray, target: xr.DataArray) -> xr.DataArray:
+        """
+        Put ``mask`` on ``target``'s spatial grid by nearest-pixel lookup.
+        
+        A no-op when both already share the same grid (always the case
+        without native_resolution).
+        """
+        my, mx = self._spatial_dims(mask)
+        ty, tx = self._spatial_dims(target)
+        if (my, mx) == (ty, tx):
+            return mask
+        iy = mask.indexes[my].get_indexer(target[ty].values, method="nearest")
+        ix = mask.indexes[mx].get_indexer(target[tx].values, method="nearest")
+        matched = mask.isel({my: xr.DataArray(iy, dims=ty), mx: xr.DataArray(ix, dims=tx)})
+        return matched.drop_vars([my, mx], errors="ignore").assign_coords({ty: target[ty], tx: target[tx]})
+    
+    def _mask_band(self, band: xr.DataArray, mask: xr.DataArray) -> xr.DataArray:
+        """
+        Mask a band without changing its dtype.
+        
+        ``where`` with the default NaN fill would silently turn uint16 bands
+        into float64 (4x the memory), so integer bands are filled with NODATA
+        and float bands with NaN.
+        """
+        fill = NODATA if np.issubdtype(band.dtype, np.integer) else np.nan
+        return band.where(self._match_grid(mask, band), fill)
+    
+    def apply_cloud_mask(self, data: xr.Dataset) -> xr.Dataset:
+        """
+        Build a lazy per-pixel validity mask from the SCL band and apply it.
+        
+        Nothing is computed here: the mask and the masked bands stay in the
+        dask graph, and the mask is kept as a ``valid`` variable so sampling
+        can skip invalid pixel-times before computing.
+        
+        Args:
+            data: Dataset loaded with the ``scl`` band
+            
+        Returns:
+            Dataset with masked bands (NODATA-filled when loaded as uint16)
+            and a boolean ``valid`` variable
+        """
+        scl = data["scl"]
+        valid = scl.notnull() & ~scl.isin(self.scl_invalid_classes)
+        
+        # With native_resolution, SCL (20 m) is mapped onto each band's grid
+        masked = xr.Dataset({band: self._mask_band(data[band], valid) for band in self.bands})
+        masked["valid"] = self._match_grid(valid, self._finest_band(data))
+        logger.info(f"☁️ Lazy SCL mask applied (invalid classes: {self.scl_invalid_classes})")
+        return masked
+    
+    def composite_temporal(self, data: xr.Dataset, date_range: Optional[str] = None) -> xr.Dataset:
+        """
+        Lazily reduce all scenes of each period to one composite.
+        
+        Cloud-masked (or nodata) values are skipped, so each composite only
+        uses clear observations. Every period is rechunked to a single time
+        chunk before reducing, keeping chunks as small as one period's
+        scenes. With ``date_range``, the output has one timestep per period
+        of the whole range, binned from the range start: periods without
+        any clear observation (including those before the first or after
+        the last scene) are NaN with ``valid`` set to False, so T is the
+        same for every tile and field. Without it, periods only span the
+        first to the last scene.
+        
+        Args:
+            data: Loaded dataset (optionally with a ``valid`` variable)
+            date_range: "start/end" range the scenes were searched for
+            
+        Returns:
+            Dataset of float32 composites, one timestep per period, with a
+            boolean ``valid`` variable
+        """
+        bands = data[self.bands]
+        if self.dtype == "uint16":
+            # Integer loads (and masks) flag missing data with the nodata value, not NaN;
+            # cast to float32 here, once, so the reductions can skip it
+            bands = bands.astype("float32").where(bands != NODATA)
+        statistic = self.composite_statistic
+        
+        def reduce(group: xr.Dataset) -> xr.Dataset:
+            group = group.chunk({"time": -1})
+            if statistic == "median":
+                return group.median("time", skipna=True)
+            if statistic == "mean":
+                return group.mean("time", skipna=True)
+            return group.quantile(statistic, dim="time", skipna=True).drop_vars("quantile")
+        
+        observed = data["valid"] if "valid" in data.data_vars else self._finest_band(bands).notnull()
+        periods = self._composite_periods(date_range)
+        if periods is None:
+            composite = bands.resample(time=self.composite_period).map(reduce).astype("float32")
+            composite["valid"] = observed.resample(time=self.composite_period).any()
+        else:
+            # Bin every scene into the range's periods, so bins (e.g. "14D") line up across tiles
+            scene_days = pd.DatetimeIndex(data["time"].values).normalize()
+            position = np.clip(periods.searchsorted(scene_days, side="right") - 1, 0, None)
+            period = xr.DataArray(periods.index[position], dims="time", coords={"time": data["time"]}, name="period")
+            composite = bands.groupby(period).map(reduce).astype("float32")
+            composite["valid"] = observed.groupby(period).any()
+            composite = composite.rename(period="time").reindex(time=periods.index, fill_value={"valid": False})
+        
+        logger.info(
+            f"🗓️ Compositing {data.sizes['time']} scenes into {composite.sizes['time']} "
+            f"{self.composite_period} periods ({statistic})"
+        )
+        return composite
+    
+    def _composite_periods(self, date_range: Optional[str]) -> Optional[pd.Series]:
+        """
+        Every composite period of ``date_range``: its first day, indexed by its label.
+        
+        Periods are binned from the range start. Returns None for a missing or
+        open-ended range.
+        """
+        if not date_range:
+            return None
+        bounds = date_range.split("/")
+        if len(bounds) != 2 or any(b in ("", "..") for b in bounds):
+            return None
+        # Scene times are naive UTC
+        start, end = (pd.Timestamp(b) for b in bounds)
+        start, end = (t.tz_convert(None) if t.tz else t for t in (start, end))
+        days = pd.date_range(start.normalize(), end, freq="D")
+        return pd.Series(days, index=days).resample(self.composite_period).first().dropna()
+    
+    def field_pixel_mask(self, dataset: xr.Dataset, fields: Union[Dict, Geometry]) -> xr.DataArray:
+        """
+        Boolean (y, x) mask of the dataset pixels whose centre lies inside the fields.
+        
+        Args:
+            dataset: Loaded dataset
+            fields: GeoJSON geometry (EPSG:4326) or odc.geo.Geometry
+            
+        Returns:
+            DataArray aligned with the dataset's y/x coordinates
+        """
+        if isinstance(fields, dict):
+            fields = Geometry(fields, crs="EPSG:4326")
+        inside = rasterize(fields, self._finest_band(dataset).odc.geobox)
+        return xr.DataArray(inside.values, dims=("y", "x"), coords={"y": dataset.y, "x": dataset.x})
+    
+    def apply_field_mask(self, dataset: xr.Dataset, fields: Union[Dict, Geometry]) -> xr.Dataset:
+        """
+        Lazily mask every band outside the field polygons.
+        
+        The field mask is folded into the ``valid`` variable (created if the
+        cloud mask is off), so sampling skips masked pixel-times before
+        computing, exactly as for clouds.
+        
+        Args:
+            dataset: Loaded dataset
+            fields: GeoJSON geometry (EPSG:4326) or odc.geo.Geometry
+            
+        Returns:
+            Dataset with masked bands and a boolean ``valid`` variable
+        """
+        inside = self.field_pixel_mask(dataset, fields)
+        valid = dataset["valid"] & inside if "valid" in dataset.data_vars else inside.expand_dims(time=dataset.time)
+        masked = xr.Dataset({band: self._mask_band(dataset[band], inside) for band in self.bands})
+        masked["valid"] = valid
+        return masked
+    
+    def sample_pixels(self,
+                      dataset: xr.Dataset,
+                      n_samples: int = 300,
+                      seed: int = 42,
+                      fields: Optional[Union[Dict, Geometry]] = None) -> Optional[xr.Dataset]:
+        """
+        Randomly select pixels and stack them along a lazy ``pixel`` dimension.
+        
+        Args:
+            dataset: xarray Dataset
+            n_samples: Number of pixels to sample
+            seed: Random seed for reproducibility
+            fields: Optional field geometry; only pixels inside it are sampled
+            
+        Returns:
+            Dataset with (time, pixel) variables and PIXEL_00001-style ids,
+            or None if there is nothing to sample
+        """
+        indices = self.sample_pixel_indices(dataset, n_samples, seed, fields)
+        if indices is None:
+            return None
+        ys, xs = indices
+        return self.stack_pixels(dataset, ys, xs)
+    
+    def sample_pixel_indices(self,
+                             dataset: xr.Dataset,
+                             n_samples: int = 300,
+                             seed: int = 42,
+                             fields: Optional[Union[Dict, Geometry]] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Draw the random pixel sample of sample_pixels without selecting any data.
+        
+        Returns:
+            Tuple of (row indices, column indices) on the ``y``/``x`` grid,
+            or None if there is nothing to sample
+        """
+        np.random.seed(seed)
+        
+        # Validate dataset dimensions
+        if 'x' not in dataset.dims or 'y' not in dataset.dims:
+            logger.error("❌ Dataset missing spatial dimensions")
+            return None
+        
+        ny, nx = len(dataset.y), len(dataset.x)
+        total_pixels = ny * nx
+        
+        if total_pixels == 0:
+            logger.error("❌ No spatial pixels found")
+            return None
+        
+        # Candidate pixels: the whole grid, or only pixels inside the fields
+        candidates = total_pixels
+        if fields is not None:
+            candidates = np.flatnonzero(self.field_pixel_mask(dataset, fields).values.ravel())
+            total_pixels = len(candidates)
+            if total_pixels == 0:
+                logger.error("❌ No pixels inside the fields")
+                return None
+        
+        # Adjust sample size if necessary
+        n_samples = min(n_samples, total_pixels)
+        if n_samples < n_samples:
+            logger.warning(f"⚠️ Reducing sample size to {n_samples} (total pixels: {total_pixels})")
+        
+        logger.info(f"🎯 Sampling {n_samples} pixels from {total_pixels} total")
+        
+        # Efficient spatial sampling
+        sampled_indices = np.random.choice(candidates, size=n_samples, replace=False)
+        return np.unravel_index(sampled_indices, shape=(ny, nx))
+    
+    def stack_pixels(self,
+                     dataset: xr.Dataset,
+                     ys: np.ndarray,
+                     xs: np.ndarray,
+                     positions: Optional[np.ndarray] = None) -> xr.Dataset:
+        """
+        Lazily select pixels by grid index and stack them along a ``pixel`` dimension.
+        
+        Args:
+            dataset: xarray Dataset
+            ys, xs: Row and column indices on the ``y``/``x`` grid
+            positions: Position of each pixel in the full sample, used for its
+                PIXEL_00001-style id (defaults to 0..n-1)
+            
+        Returns:
+            Dataset with (time, pixel) variables
+        """
+        positions = np.arange(len(ys)) if positions is None else positions
+        
+        # Create pixel identifiers
+        pixel_ids = [f"PIXEL_{i+1:05d}" for i in positions]
+        
+        # Efficient data selection
+        stacked = dataset.isel(y=("pixel", ys), x=("pixel", xs))
+        # Coarser native grids are sampled at the pixel containing each point
+        for ydim in [d for d in dataset.dims if d.startswith("y_")]:
+            xdim = "x" + ydim[1:]
+            iy = dataset.indexes[ydim].get_indexer(dataset.y.values[ys], method="nearest")
+            ix = dataset.indexes[xdim].get_indexer(dataset.x.values[xs], method="nearest")
+            stacked = stacked.isel({ydim: ("pixel", iy), xdim: ("pixel", ix)}).drop_vars([ydim, xdim])
+        stacked = stacked.assign_coords(pixel=("pixel", pixel_ids))
+        stacked = stacked.assign_coords(
+            x=("pixel", dataset.x.values[xs]),
+            y=("pixel", dataset.y.values[ys])
+        )
+        return stacked
+    
     def extract_pixel_timeseries(self, 
                                dataset: xr.Dataset,
                                n_samples: int = 300,
                                crop_type: str = "unknown",
-                               seed: int = 42) -> Optional[pd.DataFrame]:
+                               seed: int = 42,
+                               fields: Optional[Union[Dict, Geometry]] = None) -> Optional[pd.DataFrame]:
         """
         Extract pixel time series with optimized sampling and validation.
         
@@ -257,56 +752,44 @@ class SatelliteDataProcessor:
             n_samples: Number of pixels to sample
             crop_type: Crop type label
             seed: Random seed for reproducibility
+            fields: Optional field geometry; only pixels inside it are sampled
             
         Returns:
             DataFrame with pixel time series or None if failed
         """
         try:
-            np.random.seed(seed)
-            
-            # Validate dataset dimensions
-            if 'x' not in dataset.dims or 'y' not in dataset.dims:
-                logger.error("❌ Dataset missing spatial dimensions")
-                return None
-            
-            ny, nx = len(dataset.y), len(dataset.x)
-            total_pixels = ny * nx
-            
-            if total_pixels == 0:
-                logger.error("❌ No spatial pixels found")
+            stacked = self.sample_pixels(dataset, n_samples, seed, fields)
+            if stacked is None:
                 return None
             
-            # Adjust sample size if necessary
-            n_samples = min(n_samples, total_pixels)
-            if n_samples < n_samples:
-                logger.warning(f"⚠️ Reducing sample size to {n_samples} (total pixels: {total_pixels})")
-            
-            logger.info(f"🎯 Sampling {n_samples} pixels from {total_pixels} total")
-            
-            # Efficient spatial sampling
-            sampled_indices = np.random.choice(total_pixels, size=n_samples, replace=False)
-            ys, xs = np.unravel_index(sampled_indices, shape=(ny, nx))
-            
-            # Create pixel identifiers
-            pixel_ids = [f"PIXEL_{i+1:05d}" for i in range(n_samples)]
-            
-            # Efficient data selection
-            stacked = dataset.isel(y=("pixel", ys), x=("pixel", xs))
-            stacked = stacked.assign_coords(pixel=("pixel", pixel_ids))
-            stacked = stacked.assign_coords(
-                x=("pixel", dataset.x.values[xs]),
-                y=("pixel", dataset.y.values[ys])
-            )
-            
-            # Compute data in memory
-            logger.info("💾 Computing data...")
-            stacked = stacked.compute()
-            
-            # Convert to DataFrame
-            df = stacked.to_dataframe().reset_index()
+            if "valid" in stacked.data_vars:
+                # Only the small (time, pixel) mask is computed up front; band
+                # values are then computed for valid pixel-times only.
+                valid = stacked["valid"].transpose("time", "pixel").compute().values
+                time_idx, pixel_idx = np.nonzero(valid)
+                stacked = stacked.drop_vars("valid")
+                observations = stacked.isel(
+                    time=("obs", time_idx), pixel=("obs", pixel_idx)
+                )
+                bytes_per_obs = sum(stacked[band].dtype.itemsize for band in self.bands)
+                self._log_mask_savings(valid.size, len(time_idx), bytes_per_obs)
+                
+                logger.info("💾 Computing data...")
+                observations = observations.compute()
+                df = observations.to_dataframe().reset_index(drop=True)
+            else:
+                # Compute data in memory
+                logger.info("💾 Computing data...")
+                stacked = stacked.compute()
+                
+                # Convert to DataFrame
+                df = stacked.to_dataframe().reset_index()
             
             # Clean up data
             df = df.dropna(subset=self.bands)  # Remove rows with NaN values
+            if self.dtype == "uint16":
+                # Integer loads flag missing data with the nodata value, not NaN
+                df = df[(df[self.bands] != NODATA).all(axis=1)]
             
             if df.empty:
                 logger.error("❌ No valid data after cleaning")
@@ -323,7 +806,7 @@ class SatelliteDataProcessor:
             
             # Validate data ranges (for Sentinel-2, reflectance should be 0-1)
             for band in self.bands:
-                if band in df.columns:
+                if band in df.columns and self.dtype == "float32":
                     band_data = df[band]
                     if band_data.min() < 0 or band_data.max() > 1:
                         logger.warning(f"⚠️ {band} values outside expected range [0,1]: {band_data.min():.3f} to {band_data.max():.3f}")
@@ -335,13 +818,148 @@ class SatelliteDataProcessor:
             logger.error(f"❌ Error extracting pixel timeseries: {e}")
             return None
     
+    def _log_mask_savings(self, total_obs: int, valid_obs: int, bytes_per_obs: int) -> None:
+        """
+        Record and log how much data the cloud mask kept from being materialized.
+        
+        ``bytes_per_obs`` is the size of one pixel-time over all bands, in the
+        dtype the bands are actually loaded as (uint16 or float32).
+        """
+        skipped = total_obs - valid_obs
+        bytes_saved = skipped * bytes_per_obs
+        self.stats["cloud_mask"] = {
+            "total_pixel_times": int(total_obs),
+            "valid_pixel_times": int(valid_obs),
+            "skipped_pixel_times": int(skipped),
+            "skipped_fraction": skipped / total_obs if total_obs else 0.0,
+            "bytes_saved": int(bytes_saved)
+        }
+        logger.info(
+            f"☁️ Cloud mask skipped {skipped}/{total_obs} pixel-times "
+            f"({self.stats['cloud_mask']['skipped_fraction']:.1%}, {bytes_saved / 1024**2:.2f} MB not computed)"
+        )
+    
+    def load_field_windows(self,
+                           items: object,
+                           fields: gpd.GeoDataFrame,
+                           max_gap_m: float = 500.0,
+                           mask_to_fields: bool = False,
+                           chunk_size: int = 2048,
+                           date_range: Optional[str] = None) -> List[Tuple[Dict, xr.Dataset]]:
+        """
+        Load one window per cluster of nearby fields instead of the total bounds.
+        
+        Args:
+            items: Search results or items covering all the fields
+            fields: Field polygons in EPSG:4326
+            max_gap_m: Maximum gap, in metres, between fields of one window
+            mask_to_fields: Mask band values outside the field polygons
+            chunk_size: Chunk size for Dask arrays
+            date_range: Searched date range, passed on to load_satellite_data
+            
+        Returns:
+            List of (window, dataset) pairs; each window also records its
+            ``in_field_pixels``
+        """
+        # Every window re-reads the items, so a streamed search must be collected once
+        if not isinstance(items, (list, ItemCollection)) and not callable(getattr(items, "items", None)):
+            items = ItemCollection(items)
+        
+        loaded = []
+        for window in self.cluster_field_windows(fields, max_gap_m):
+            dataset = self.load_satellite_data(items, window["bbox"], chunk_size, date_range)
+            if dataset is None:
+                continue
+            window["in_field_pixels"] = int(self.field_pixel_mask(dataset, window["fields"]).sum())
+            if mask_to_fields:
+                dataset = self.apply_field_mask(dataset, window["fields"])
+            loaded.append((window, dataset))
+        
+        self._log_window_savings(fields, loaded)
+        return loaded
+    
+    def _log_window_savings(self, fields: gpd.GeoDataFrame, loaded: List[Tuple[Dict, xr.Dataset]]) -> None:
+        """Record and log how much smaller the field windows are than the total-bounds box."""
+        minx, miny, maxx, maxy = fields.to_crs(fields.estimate_utm_crs()).total_bounds
+        bbox_pixels = int(np.ceil((maxx - minx) / 10) * np.ceil((maxy - miny) / 10))
+        loaded_pixels = sum(int(ds.sizes["x"] * ds.sizes["y"]) for _, ds in loaded)
+        in_field_pixels = sum(window["in_field_pixels"] for window, _ in loaded)
+        self.stats["field_windows"] = {
+            "n_fields": len(fields),
+            "n_windows": len(loaded),
+            "bbox_pixels": bbox_pixels,
+            "loaded_pixels": loaded_pixels,
+            "in_field_pixels": in_field_pixels,
+            "loaded_area_reduction": 1 - loaded_pixels / bbox_pixels if bbox_pixels else 0.0,
+        }
+        logger.info(
+            f"🪟 {len(loaded)} windows load {loaded_pixels} pixels instead of {bbox_pixels} "
+            f"({self.stats['field_windows']['loaded_area_reduction']:.1%} less), {in_field_pixels} inside fields"
+        )
+    
+    def extract_field_window_timeseries(self,
+                                        loaded: List[Tuple[Dict, xr.Dataset]],
+                                        n_samples: int = 300,
+                                        crop_type: str = "unknown",
+                                        seed: int = 42) -> Optional[pd.DataFrame]:
+        """
+        Sample pixels inside the fields of every window.
+        
+        Samples are split across windows in proportion to their in-field
+        pixel counts, so the result matches uniform sampling over all fields.
+        
+        Args:
+            loaded: Output of load_field_windows
+            n_samples: Total number of pixels to sample
+            crop_type: Crop type label
+            seed: Random seed for reproducibility
+            
+        Returns:
+            DataFrame with pixel time series or None if failed
+        """
+        weights = np.array([window["in_field_pixels"] for window, _ in loaded], dtype=float)
+        if weights.sum() == 0:
+            logger.error("❌ No pixels inside the fields")
+            return None
+        
+        # Largest-remainder allocation, capped by each window's pixel count
+        n_samples = min(n_samples, int(weights.sum()))
+        quotas = weights / weights.sum() * n_samples
+        allocation = np.floor(quotas).astype(int)
+        for i in np.argsort(quotas - allocation)[::-1][:n_samples - allocation.sum()]:
+            allocation[i] += 1
+        
+        frames = []
+        for i, ((window, dataset), n_window) in enumerate(zip(loaded, allocation)):
+            if n_window == 0:
+                continue
+            df = self.extract_pixel_timeseries(dataset, int(n_window), crop_type, seed + i, fields=window["fields"])
+            if df is not None:
+                df["unique_id"] = f"W{i:03d}_" + df["unique_id"]
+                frames.append(df)
+        
+        if not frames:
+            return None
+        
+        df = pd.concat(frames, ignore_index=True)
+        # Renumber so ids keep the PIXEL_00001 format across windows
+        codes, _ = pd.factorize(df["unique_id"])
+        df["unique_id"] = [f"PIXEL_{code + 1:05d}" for code in codes]
+        return df
+    
     def process_crop_data(self, 
                          geojson_path: Union[str, Path],
                          date_range: str,
                          crop_type: str,
                          n_samples: int = 300,
                          cloud_cover_max: float = 20.0,
-                         output_path: Optional[Union[str, Path]] = None) -> Optional[pd.DataFrame]:
+                         output_path: Optional[Union[str, Path]] = None,
+                         concurrent_search: bool = False,
+                         per_field: bool = False,
+                         max_gap_m: float = 500.0,
+                         mask_to_fields: bool = False,
+                         label_fields: bool = False,
+                         field_id_column: Optional[str] = None) -> Optional[pd.DataFrame]:
         """
         Complete pipeline for processing one crop type.
         
@@ -351,7 +969,16 @@ class SatelliteDataProcessor:
             crop_type: Crop type label
             n_samples: Number of samples to extract
             cloud_cover_max: Maximum cloud cover
-            output_path: Optional output CSV path
+            output_path: Optional output CSV path (dataset directory for parquet)
+            concurrent_search: Use the date-partitioned concurrent STAC search
+            per_field: Load one window per cluster of nearby fields and sample
+                only pixels inside fields, instead of the total-bounds box
+            max_gap_m: Maximum gap between fields of one window (per_field only)
+            mask_to_fields: Mask band values outside the fields (per_field only)
+            label_fields: Label each pixel with the field polygon it falls in
+                (field_id, and crop_type from the polygons' crop_type column
+                when present) and drop pixels outside every field
+            field_id_column: Polygon column used as field_id (default: row position)
             
         Returns:
             DataFrame or None if failed
@@ -359,52 +986,71 @@ class SatelliteDataProcessor:
         logger.info(f"🌱 Processing {crop_type} data from {Path(geojson_path).name}")
         
         # Step 1: Extract bounding box
-        bbox_geometry = self.extract_bbox_from_geojson(geojson_path)
-        if bbox_geometry is None:
+        fields = self.read_field_geometries(geojson_path)
+        if fields is None:
             return None
+        bbox_geometry = self._bbox_polygon(fields.total_bounds)
         
         # Step 2: Search satellite data
         items, search = self.search_satellite_data(
-            bbox_geometry, date_range, cloud_cover_max=cloud_cover_max
+            bbox_geometry, date_range, cloud_cover_max=cloud_cover_max,
+            concurrent=concurrent_search
         )
         if items is None:
             return None
         
-        # Step 3: Load data
-        dataset = self.load_satellite_data(search, bbox_geometry)
-        if dataset is None:
-            return None
-        
-        # Step 4: Extract pixel timeseries
-        df = self.extract_pixel_timeseries(dataset, n_samples, crop_type)
+        if per_field:
+            # Steps 3-4: Load field windows and sample inside fields
+            loaded = self.load_field_windows(items, fields, max_gap_m, mask_to_fields, date_range=date_range)
+            if not loaded:
+                return None
+            dataset = loaded[0][1]
+            df = self.extract_field_window_timeseries(loaded, n_samples, crop_type)
+        else:
+            # Step 3: Load data
+            dataset = self.load_satellite_data(search, bbox_geometry, date_range=date_range)
+            if dataset is None:
+                return None
+            
+            # Step 4: Extract pixel timeseries
+            df = self.extract_pixel_timeseries(dataset, n_samples, crop_type)
         if df is None:
             return None
         
+        if label_fields:
+            # Step 4b: Label pixels with the field they fall in
+            df, self.stats["field_labels"] = label_pixels(
+                df, fields, self._finest_band(dataset).odc.crs, id_column=field_id_column,
+                crop_column="crop_type" if "crop_type" in fields.columns else None
+            )
+            if df.empty:
+                logger.error("❌ No sampled pixels inside the fields")
+                return None
+        
         # Step 5: Save if requested
         if output_path:
             output_path = Path(output_path)
-            df.to_csv(output_path, index=False)
+            if self.output_format == "parquet":
+                # Replace this crop's partitions from an earlier run; other crops are kept
+                write_partitioned_parquet(df, output_path, self.bands,
+                                          existing_data_behavior="delete_matching")
+            else:
+                df.to_csv(output_path, index=False)
             logger.info(f"💾 Saved {len(df)} records to {output_path}")
         
         return df
     
-    def process_multiple_crops(self, 
-                             crop_configs: List[Dict],
-                             output_combined: Optional[Union[str, Path]] = None,
-                             max_workers: int = 2) -> Optional[pd.DataFrame]:
+    def _run_crops_in_threads(self, crop_configs: List[Dict], max_workers: int,
+                              dataset_root: Optional[Path] = None) -> List:
         """
-        Process multiple crop types with parallel processing.
+        Run crop configurations in a thread pool, sharing this processor.
+        
+        With ``dataset_root``, each result is written into that Parquet
+        dataset as soon as its crop completes and is not kept in memory.
         
-        Args:
-            crop_configs: List of dicts with keys: geojson_path, date_range, crop_type, n_samples
-            output_combined: Path for combined output CSV
-            max_workers: Maximum parallel workers
-            
         Returns:
-            Combined DataFrame or None if failed
+            Result DataFrames, or the dataset root once per written result
         """
-        logger.info(f"🚀 Processing {len(crop_configs)} crop types with {max_workers} workers")
-        
         results = []
         
         # Use ThreadPoolExecutor for I/O bound operations
@@ -417,16 +1063,27 @@ class SatelliteDataProcessor:
                     config['date_range'],
                     config['crop_type'],
                     config.get('n_samples', 300),
-                    config.get('cloud_cover_max', 20.0)
-                ): config for config in crop_configs
+                    config.get('cloud_cover_max', 20.0),
+                    None,
+                    config.get('concurrent_search', False),
+                    config.get('per_field', False),
+                    config.get('max_gap_m', 500.0),
+                    config.get('mask_to_fields', False),
+                    config.get('label_fields', False),
+                    config.get('field_id_column')
+                ): (i, config) for i, config in enumerate(crop_configs)
             }
             
             # Collect results
             for future in as_completed(future_to_config):
-                config = future_to_config[future]
+                i, config = future_to_config[future]
                 try:
                     result = future.result()
                     if result is not None:
+                        if dataset_root is not None:
+                            # One file prefix per config: configs may share a crop type
+                            result = write_partitioned_parquet(result, dataset_root, self.bands,
+                                                               basename=f"s2_{i:03d}_{config['crop_type']}")
                         results.append(result)
                         logger.info(f"✅ Completed {config['crop_type']}")
                     else:
@@ -434,10 +1091,149 @@ class SatelliteDataProcessor:
                 except Exception as e:
                     logger.error(f"❌ Error processing {config['crop_type']}: {e}")
         
+        return results
+    
+    def _run_crops_in_workers(self,
+                              crop_configs: List[Dict],
+                              executor: str,
+                              max_workers: int,
+                              threads_per_worker: int,
+                              work_dir: Path,
+                              dataset_root: Optional[Path] = None) -> List:
+        """
+        Run each crop configuration in its own worker process.
+        
+        Workers write their result to a file under ``work_dir`` and return
+        only its path, so DataFrames are never pickled between processes.
+        With ``dataset_root``, each worker's Parquet files are moved into
+        that dataset instead of being read back.
+        
+        Returns:
+            Result DataFrames, or the dataset root once per moved result
+        """
+        work_dir.mkdir(parents=True, exist_ok=True)
+        suffix = "" if self.output_format == "parquet" else ".csv"
+        jobs = [
+            (config, str(work_dir / f"s2_{i:03d}_{config['crop_type']}{suffix}"))
+            for i, config in enumerate(crop_configs)
+        ]
+        
+        paths = []
+        if executor == "process":
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                future_to_config = {
+                    pool.submit(_process_crop_to_file, self._init_kwargs, config, path): config
+                    for config, path in jobs
+                }
+                for future in as_completed(future_to_config):
+                    paths.append(self._collect_worker_result(future.result, future_to_config[future]))
+        else:
+            try:
+                from dask.distributed import Client as DaskClient, LocalCluster, as_completed as dask_as_completed
+            except ImportError as e:
+                raise ImportError("The dask executor requires dask.distributed (pip install distributed)") from e
+            
+            with LocalCluster(n_workers=max_workers, threads_per_worker=threads_per_worker,
+                              processes=True) as cluster, DaskClient(cluster) as client:
+                logger.info(f"🧮 Dask dashboard: {client.dashboard_link}")
+                future_to_config = {
+                    client.submit(_process_crop_to_file, self._init_kwargs, config, path, pure=False): config
+                    for config, path in jobs
+                }
+                for future in dask_as_completed(future_to_config):
+                    paths.append(self._collect_worker_result(future.result, future_to_config[future]))
+        
+        paths = [path for path in paths if path is not None]
+        if dataset_root is not None:
+            return [move_into_dataset(path, dataset_root, basename=Path(path).name) for path in paths]
+        return [pd.read_csv(path) for path in paths]
+    
+    @staticmethod
+    def _collect_worker_result(get_result, config: Dict) -> Optional[str]:
+        """Resolve one worker future into its output path, logging failures."""
+        try:
+            path = get_result()
+            if path is not None:
+                logger.info(f"✅ Completed {config['crop_type']}")
+            else:
+                logger.error(f"❌ Failed to process {config['crop_type']}")
+            return path
+        except Exception as e:
+            logger.error(f"❌ Error processing {config['crop_type']}: {e}")
+            return None
+    
+    def process_multiple_crops(self, 
+                             crop_configs: List[Dict],
+                             output_combined: Optional[Union[str, Path]] = None,
+                             max_workers: int = 2,
+                             executor: str = "thread",
+                             threads_per_worker: int = 1,
+                             work_dir: Optional[Union[str, Path]] = None) -> Optional[Union[pd.DataFrame, pads.Dataset]]:
+        """
+        Process multiple crop types with parallel processing.
+        
+        With CSV output, results are combined and shuffled in memory. With
+        Parquet output, each crop's result goes into a partitioned dataset as
+        soon as it completes, and the rows are shuffled out of core from
+        there into ``output_combined``; no combined DataFrame is built.
+        
+        Args:
+            crop_configs: List of dicts with keys: geojson_path, date_range, crop_type, n_samples
+                (optional: cloud_cover_max, concurrent_search, per_field, max_gap_m, mask_to_fields,
+                label_fields, field_id_column)
+            output_combined: Path for combined output CSV (or .parquet file; the
+                partitioned per-crop dataset is written next to it). Required
+                for Parquet output
+            max_workers: Maximum parallel workers
+            executor: "thread", "process" (one worker process per crop) or
+                "dask" (local dask distributed cluster)
+            threads_per_worker: Threads per dask worker (dask executor only)
+            work_dir: Directory for per-crop result files handed back by
+                process/dask workers (defaults to a temporary directory)
+            
+        Returns:
+            Combined DataFrame (CSV), a lazy pyarrow dataset over the shuffled
+            .parquet file (Parquet), or None if failed
+        """
+        if executor not in ("thread", "process", "dask"):
+            raise ValueError(f"Unsupported executor: {executor}")
+        
+        dataset_root = None
+        if self.output_format == "parquet":
+            if not output_combined:
+                raise ValueError("Parquet output needs output_combined (path of the combined .parquet file)")
+            output_combined = Path(output_combined).with_suffix(".parquet")
+            # Files left by an earlier run would be combined too
+            dataset_root = clear_dataset(output_combined.with_suffix(""))
+        
+        logger.info(f"🚀 Processing {len(crop_configs)} crop types with {max_workers} {executor} workers")
+        
+        if executor == "thread":
+            results = self._run_crops_in_threads(crop_configs, max_workers, dataset_root)
+        else:
+            with tempfile.TemporaryDirectory(prefix="s2_crops_") as tmp_dir:
+                results = self._run_crops_in_workers(
+                    crop_configs, executor, max_workers, threads_per_worker,
+                    Path(work_dir or tmp_dir), dataset_root
+                )
+        
         if not results:
             logger.error("❌ No successful results")
             return None
         
+        if dataset_root is not None:
+            # Shuffle from the lazily scanned partitioned dataset, not from memory
+            combine_and_shuffle(dataset_root, output_combined)
+            combined = open_combined(output_combined)
+            crop_counts = combined.to_table(columns=["crop_type"]).column("crop_type").to_pandas().value_counts()
+            times = combined.to_table(columns=["time"]).column("time").to_pandas()
+            logger.info("📊 Final dataset summary:")
+            logger.info(f"   Total records: {combined.count_rows()}")
+            logger.info(f"   Crop types: {crop_counts.to_dict()}")
+            logger.info(f"   Date range: {times.min()} to {times.max()}")
+            logger.info(f"💾 Saved combined dataset to {output_combined}")
+            return combined
+        
         # Combine results
         logger.info("🔄 Combining results...")
         combined_df = pd.concat(results, ignore_index=True)
@@ -453,13 +1249,42 @@ class SatelliteDataProcessor:
         
         # Save combined results
         if output_combined:
-            output_combined = Path(output_combined)
             combined_df.to_csv(output_combined, index=False)
             logger.info(f"💾 Saved combined dataset to {output_combined}")
         
         return combined_df
 
 
+def _process_crop_to_file(processor_kwargs: Dict, config: Dict, output_path: str) -> Optional[str]:
+    """
+    Worker entry point: process one crop configuration in a fresh processor.
+    
+    Args:
+        processor_kwargs: Keyword arguments to rebuild the SatelliteDataProcessor
+        config: Crop configuration dict
+        output_path: File (or dataset directory) the result is written to
+        
+    Returns:
+        output_path on success, None otherwise
+    """
+    processor = SatelliteDataProcessor(**processor_kwargs)
+    df = processor.process_crop_data(
+        config['geojson_path'],
+        config['date_range'],
+        config['crop_type'],
+        config.get('n_samples', 300),
+        config.get('cloud_cover_max', 20.0),
+        output_path,
+        config.get('concurrent_search', False),
+        config.get('per_field', False),
+        config.get('max_gap_m', 500.0),
+        config.get('mask_to_fields', False),
+        config.get('label_fields', False),
+        config.get('field_id_column')
+    )
+    return output_path if df is not None else None
+
+
 def main():
     """
     Example usage of the robust satellite data processor.
@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+from collections import Counter
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+SLOT_FIELD = "_slot"
+
+
+class CaseJournal:
+    """
+    Append-only JSONL journal of completed synthetic cases.
+
+    Each case is written as one line, flushed and fsynced as soon as it
+    completes, tagged with its slot (position in the planned distribution).
+    A crash loses at most the case being written; a torn last line is cut
+    off when the journal is reopened.
+    """
+
+    def __init__(self, path: str = "synthetic_journal.jsonl", resume: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        if resume and os.path.exists(path):
+            self._repair()
+        else:
+            open(path, "w").close()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _repair(self):
+        """Truncate a partially written trailing line left by a crash."""
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+
+    def append(self, slot: int, row: Dict):
+        line = json.dumps({SLOT_FIELD: slot, **row}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Stream journaled rows (with their slot) without loading the file."""
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def close(self):
+        self._file.close()
+
+
+def remaining_slots(plan: Sequence[Tuple[str, str]], done: Sequence[Dict], num_samples: int) -> List[int]:
+    """
+    Slots of ``plan`` still to generate, given the journaled rows ``done``.
+
+    A journaled row first claims its own slot when that slot still plans the
+    same (competency, panel); otherwise it claims any unclaimed slot with
+    that pair. Rows that match nothing (e.g. the plan was re-drawn without a
+    seed) still count towards ``num_samples``, and the remaining slots are
+    trimmed so the total stays at ``num_samples`` while keeping the plan's
+    competency/panel proportions.
+    """
+    claimed = set()
+    unmatched = []
+    for row in done:
+        slot = row.get(SLOT_FIELD)
+        pair = (row["Nursing Competency"], row["Clinical Panel"])
+        if isinstance(slot, int) and 0 <= slot < len(plan) and slot not in claimed and tuple(plan[slot]) == pair:
+            claimed.add(slot)
+        else:
+            unmatched.append(pair)
+
+    wanted = Counter(unmatched)
+    unclaimed = []
+    for slot, pair in enumerate(plan):
+        if slot in claimed:
+            continue
+        if wanted[tuple(pair)] > 0:
+            wanted[tuple(pair)] -= 1
+            claimed.add(slot)
+        else:
+            unclaimed.append(slot)
+
+    n_left = max(0, num_samples - len(done))
+    if len(unclaimed) <= n_left:
+        return unclaimed
+    # Spread the trimmed slots evenly over the plan instead of cutting its tail
+    step = len(unclaimed) / n_left if n_left else 0
+    return [unclaimed[int(i * step)] for i in range(n_left)]
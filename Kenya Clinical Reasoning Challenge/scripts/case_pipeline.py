@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One pipeline stage: ``fn`` maps an item to the next stage's item, or None to drop it.
+
+    With ``batch_size`` > 1, ``fn`` instead receives a list of up to
+    ``batch_size`` items and returns one result (or None) per item. A worker
+    starts on a partial batch once ``max_wait`` seconds pass without it
+    filling, so a batching stage never stalls the tail of the stream.
+
+    Args:
+        name: Stage name used in the stats
+        fn: Work function, called from ``workers`` threads
+        workers: Number of threads running this stage
+        batch_size: Items per call to ``fn``
+        max_wait: Seconds a worker waits to fill a batch
+    """
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, batch_size: int = 1, max_wait: float = 2.0):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+
+
+def _take(inbox: queue.Queue, stage: Stage) -> Tuple[List, bool]:
+    """Next batch of up to ``stage.batch_size`` items, and whether the stop marker was reached."""
+    item = inbox.get()
+    if item is _DONE:
+        return [], True
+    batch = [item]
+    deadline = time.perf_counter() + stage.max_wait
+    while len(batch) < stage.batch_size:
+        timeout = deadline - time.perf_counter()
+        if timeout <= 0:
+            break
+        try:
+            item = inbox.get(timeout=timeout)
+        except queue.Empty:
+            break
+        if item is _DONE:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+def run_pipeline(items: Iterable, stages: List[Stage], queue_size: int = 32,
+                 on_output: Optional[Callable] = None) -> Dict[str, Dict]:
+    """
+    Stream items through stages connected by bounded queues.
+
+    Every stage runs on its own threads and starts on an item as soon as the
+    previous stage hands it over, so all stages work at once and wall time
+    tends to the slowest stage's total time divided by its worker count.
+    Bounded queues apply backpressure: a fast stage blocks instead of piling
+    up work (and memory) in front of a slow one. Items a stage drops never
+    reach later stages, and exceptions drop only the failing item (or batch).
+
+    Args:
+        items: Inputs to the first stage
+        stages: Stages in order
+        queue_size: Capacity of each queue between stages
+        on_output: Called (from a worker thread) with each item leaving the last stage
+
+    Returns:
+        Per-stage stats: items in, out, dropped, errors and busy seconds
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    stats = {stage.name: {"in": 0, "out": 0, "dropped": 0, "errors": 0, "busy_s": 0.0} for stage in stages}
+    lock = threading.Lock()
+
+    def feed():
+        for item in items:
+            queues[0].put(item)
+        for _ in range(stages[0].workers):
+            queues[0].put(_DONE)
+
+    def work(index: int, stage: Stage, remaining: List[int]):
+        inbox, outbox = queues[index], queues[index + 1]
+        counts = stats[stage.name]
+        done = False
+        while not done:
+            batch, done = _take(inbox, stage)
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                results = stage.fn(batch) if stage.batch_size > 1 else [stage.fn(batch[0])]
+                error = False
+            except Exception as e:
+                print(f"Error in {stage.name} stage: {e}")
+                results, error = [None] * len(batch), True
+            busy = time.perf_counter() - start
+
+            with lock:
+                counts["in"] += len(batch)
+                counts["busy_s"] += busy
+                if error:
+                    counts["errors"] += len(batch)
+                else:
+                    kept = sum(result is not None for result in results)
+                    counts["dropped"] += len(batch) - kept
+                    counts["out"] += kept
+            for result in results:
+                if result is None:
+                    continue
+                if index + 1 < len(stages):
+                    outbox.put(result)
+                elif on_output is not None:
+                    on_output(result)
+
+        # The last worker of a stage to finish tells the next stage's workers to stop
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and index + 1 < len(stages):
+            for _ in range(stages[index + 1].workers):
+                outbox.put(_DONE)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for index, stage in enumerate(stages):
+        remaining = [stage.workers]
+        threads.extend(
+            threading.Thread(target=work, args=(index, stage, remaining), daemon=True)
+            for _ in range(stage.workers)
+        )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def bottleneck(stats: Dict[str, Dict], stages: List[Stage]) -> Tuple[str, float]:
+    """Stage with the largest busy time per worker, and that time (the wall-time floor)."""
+    per_worker = {stage.name: stats[stage.name]["busy_s"] / stage.workers for stage in stages}
+    name = max(per_worker, key=per_worker.get)
+    return name, per_worker[name]
@@ -1,25 +1,52 @@
 # %%writefile data_augmentation_script.py
 
-import google.generativeai as genai
 from datasets import Dataset
 import pandas as pd
 import random
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import time
 from tqdm.auto import tqdm
 import json
-from kaggle_secrets import UserSecretsClient
-
-user_secrets = UserSecretsClient()
-secret_value_0 = user_secrets.get_secret("GEMINI_API_KEY")
-
-# Configure Gemini API (replace with your actual API key)
-genai.configure(api_key=secret_value_0)
-model = genai.GenerativeModel('gemini-2.5-pro')
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from model_client import RateLimitedModel, StubModel
+from response_cache import CachedModel
+from case_journal import SLOT_FIELD, CaseJournal, remaining_slots
+from case_pipeline import Stage, bottleneck, run_pipeline
+from near_duplicates import NearDuplicateFilter
+
+# Gemini 2.5 Pro quota (adjust to your tier)
+GEMINI_RPM = 150
+GEMINI_TPM = 2_000_000
+QUALITY_THRESHOLD = 7.0
+GEMINI_CACHE_PATH = "gemini_cache.sqlite"
+
+def get_gemini_api_key():
+    """Read the Gemini API key from Kaggle secrets, falling back to the GEMINI_API_KEY env var"""
+    try:
+        from kaggle_secrets import UserSecretsClient
+        return UserSecretsClient().get_secret("GEMINI_API_KEY")
+    except Exception:
+        return os.environ.get("GEMINI_API_KEY")
+
+_gemini_model = None
+
+def get_gemini_model():
+    """Configure the Gemini API on first use and return the shared gemini-2.5-pro model"""
+    global _gemini_model
+    if _gemini_model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=get_gemini_api_key())
+        _gemini_model = genai.GenerativeModel('gemini-2.5-pro')
+    return _gemini_model
 
 class KenyanHealthcareSyntheticDataGenerator:
-    def __init__(self, original_dataset):
+    def __init__(self, original_dataset, llm=None, max_workers: int = 1):
         self.original_dataset = original_dataset
+        # Any object with generate_content: the Gemini model, a RateLimitedModel or a StubModel
+        self.model = llm if llm is not None else get_gemini_model()
+        self.max_workers = max_workers
         self.kenyan_counties = [
             "Nairobi", "Mombasa", "Kisumu", "Nakuru", "Uasin Gishu", "Kakamega",
             "Kiambu", "Machakos", "Kajiado", "Nyeri", "Meru", "Garissa", "Kitale",
@@ -40,6 +67,12 @@ class KenyanHealthcareSyntheticDataGenerator:
         ]
         self.years_experience = list(range(5, 25))  # Range of experience years from dataset
 
+    def _generate(self, prompt: str, slot=None, **kwargs):
+        """Call generate_content, keying a CachedModel entry by the case slot when one is given"""
+        if slot is not None and isinstance(self.model, CachedModel):
+            kwargs["cache_slot"] = slot
+        return self.model.generate_content(prompt, **kwargs)
+
     def analyze_original_patterns(self):
         """Analyze patterns in the original dataset to guide synthetic generation"""
         sample_prompts = self.original_dataset["Prompt"][:10]
@@ -71,19 +104,20 @@ class KenyanHealthcareSyntheticDataGenerator:
         """
         
         try:
-            response = model.generate_content(analysis_prompt)
+            response = self.model.generate_content(analysis_prompt)
             return response.text
         except Exception as e:
             print(f"Error analyzing patterns: {e}")
             return "Generate realistic Kenyan healthcare cases with authentic clinical details."
 
-    def generate_synthetic_case(self, nursing_competency: str, clinical_panel: str, patterns_guide: str) -> Dict[str, str]:
-        """Generate a single synthetic case using Gemini"""
+    def generate_synthetic_case(self, nursing_competency: str, clinical_panel: str, patterns_guide: str, rng=random,
+                                slot=None) -> Dict[str, str]:
+        """Generate a single synthetic case using Gemini (slot: deterministic case id used as the cache key)"""
         
-        county = random.choice(self.kenyan_counties)
-        health_level = random.choice(self.health_levels)
-        years_experience = random.choice(self.years_experience)
-        master_index = f"ID_{''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=5))}"
+        county = rng.choice(self.kenyan_counties)
+        health_level = rng.choice(self.health_levels)
+        years_experience = rng.choice(self.years_experience)
+        master_index = f"ID_{''.join(rng.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=5))}"
         
         generation_prompt = f"""
         You are an expert in Kenyan healthcare systems. Generate an authentic clinical case vignette that matches the patterns and quality of real cases from Kenyan healthcare facilities, aligned with the dataset structure.
@@ -122,7 +156,7 @@ class KenyanHealthcareSyntheticDataGenerator:
         """
 
         try:
-            response = model.generate_content(generation_prompt)
+            response = self._generate(generation_prompt, slot)
             response_text = response.text.strip()
             # Parse response to extract Prompt and DDX SNOMED
             prompt = response_text.split("Prompt:")[1].split("DDX SNOMED:")[0].strip()
@@ -141,8 +175,8 @@ class KenyanHealthcareSyntheticDataGenerator:
             print(f"Error generating case: {e}")
             return None
 
-    def generate_clinical_response(self, prompt: str, context: Dict) -> str:
-        """Generate appropriate clinical response for the synthetic case"""
+    def generate_clinical_response(self, prompt: str, context: Dict, slot=None) -> str:
+        """Generate appropriate clinical response for the synthetic case (slot as in generate_synthetic_case)"""
         
         response_prompt = f"""
         You are a nurse with {context['Years of Experience']} years of experience working at a {context['Health level']} in {context['County']}, Kenya, specializing in {context['Nursing Competency']}.
@@ -169,70 +203,250 @@ class KenyanHealthcareSyntheticDataGenerator:
         """
 
         try:
-            response = model.generate_content(response_prompt)
+            response = self._generate(response_prompt, slot)
             return response.text.strip()
         except Exception as e:
             print(f"Error generating response: {e}")
             return ""
 
-    def generate_synthetic_dataset(self, num_samples: int = 200) -> Dataset:
-        """Generate complete synthetic dataset aligned with the original dataset structure"""
+    def _generate_sample(self, competency: str, panel: str, patterns_guide: str, rng=random, slot=None) -> Dict[str, str]:
+        """Generate one case and its clinical response as a dataset row (None on failure)"""
+        case_data = self.generate_synthetic_case(competency, panel, patterns_guide, rng, slot)
+        if not case_data:
+            return None
+        
+        # Generate clinical response
+        clinical_response = self.generate_clinical_response(
+            case_data["Prompt"], 
+            case_data,
+            slot
+        )
         
-        print("🔍 Analyzing original dataset patterns...")
-        patterns_guide = self.analyze_original_patterns()
+        return self._to_row(case_data, clinical_response)
+
+    @staticmethod
+    def _to_row(case_data: Dict[str, str], clinical_response: str) -> Dict[str, str]:
+        """Dataset row for a generated case and its clinical response"""
+        return {
+            "Master_Index": case_data["Master_Index"],
+            "County": case_data["County"],
+            "Health level": case_data["Health level"],
+            "Years of Experience": case_data["Years of Experience"],
+            "Prompt": case_data["Prompt"],
+            "Nursing Competency": case_data["Nursing Competency"],
+            "Clinical Panel": case_data["Clinical Panel"],
+            "Clinician": clinical_response,
+            "GPT4.0": "",  # Placeholder for consistency
+            "LLAMA": "",    # Placeholder for consistency
+            "GEMINI": "",   # Placeholder for consistency
+            "DDX SNOMED": case_data["DDX SNOMED"]
+        }
+
+    def generate_synthetic_dataset(self, num_samples: int = 200, max_workers: int = None, seed: int = None,
+                                   journal_path: str = "synthetic_journal.jsonl", resume: bool = False) -> Dataset:
+        """Generate complete synthetic dataset aligned with the original dataset structure
         
-        print(f"🏥 Generating {num_samples} synthetic cases...")
+        With max_workers > 1, samples are generated concurrently on a thread pool;
+        pacing is then left to the model wrapper (e.g. RateLimitedModel) instead of sleeps.
+        A seed gives every sample its own random stream, so prompts are reproducible
+        regardless of thread scheduling (needed to replay a CachedModel).
+        
+        Every completed case is appended to the JSONL journal at journal_path as soon as it
+        finishes. With resume=True, journaled cases are kept, only the remaining
+        competency/panel quotas are generated, and the Dataset is read back from the journal.
+        """
+        max_workers = max_workers or self.max_workers
+        journal = CaseJournal(journal_path, resume=resume)
+        done = list(journal)
         
-        synthetic_data = []
         # Distribute samples across nursing competencies
-        competency_distribution = [random.choice(self.nursing_competencies) for _ in range(num_samples)]
-        panel_distribution = [random.choice(self.clinical_panels) for _ in range(num_samples)]
+        rng = random.Random(seed) if seed is not None else random
+        competency_distribution = [rng.choice(self.nursing_competencies) for _ in range(num_samples)]
+        panel_distribution = [rng.choice(self.clinical_panels) for _ in range(num_samples)]
+        slots = remaining_slots(list(zip(competency_distribution, panel_distribution)), done, num_samples)
+        if done:
+            print(f"♻️ Resuming from {journal_path}: {len(done)} cases done, {len(slots)} to go")
         
-        for i, (competency, panel) in enumerate(tqdm(zip(competency_distribution, panel_distribution), total=num_samples, desc="Generating cases")):
-            case_data = self.generate_synthetic_case(competency, panel, patterns_guide)
+        if slots:
+            print("🔍 Analyzing original dataset patterns...")
+            patterns_guide = self.analyze_original_patterns()
             
-            if case_data:
-                # Generate clinical response
-                clinical_response = self.generate_clinical_response(
-                    case_data["Prompt"], 
-                    case_data
-                )
-                
-                synthetic_data.append({
-                    "Master_Index": case_data["Master_Index"],
-                    "County": case_data["County"],
-                    "Health level": case_data["Health level"],
-                    "Years of Experience": case_data["Years of Experience"],
-                    "Prompt": case_data["Prompt"],
-                    "Nursing Competency": case_data["Nursing Competency"],
-                    "Clinical Panel": case_data["Clinical Panel"],
-                    "Clinician": clinical_response,
-                    "GPT4.0": "",  # Placeholder for consistency
-                    "LLAMA": "",    # Placeholder for consistency
-                    "GEMINI": "",   # Placeholder for consistency
-                    "DDX SNOMED": case_data["DDX SNOMED"]
-                })
-                
-                # Rate limiting
-                time.sleep(1)
+            print(f"🏥 Generating {len(slots)} synthetic cases...")
+            sample_rngs = {i: random.Random(f"{seed}:{i}") if seed is not None else random for i in slots}
+            jobs = [(i, competency_distribution[i], panel_distribution[i], sample_rngs[i]) for i in slots]
             
-            # Save progress every 50 samples
-            if (i + 1) % 50 == 0:
-                df = pd.DataFrame(synthetic_data)
-                df.to_csv(f"synthetic_progress_{i+1}.csv", index=False)
-                print(f"💾 Saved progress: {i+1} samples")
-
-        print(f"✅ Generated {len(synthetic_data)} synthetic cases")
-        return Dataset.from_pandas(pd.DataFrame(synthetic_data))
-
-    def quality_filter_synthetic_data(self, synthetic_dataset: Dataset) -> Dataset:
-        """Filter synthetic data for quality using Gemini"""
+            if max_workers > 1:
+                self._generate_concurrently(jobs, patterns_guide, max_workers, journal)
+            else:
+                for i, competency, panel, sample_rng in tqdm(jobs, desc="Generating cases"):
+                    sample = self._generate_sample(competency, panel, patterns_guide, sample_rng, i)
+                    
+                    if sample:
+                        journal.append(i, sample)
+                        
+                        # Rate limiting
+                        time.sleep(1)
+        journal.close()
+
+        synthetic_dataset = self._load_journal(journal_path)
+        print(f"✅ Generated {len(synthetic_dataset)} synthetic cases")
+        return synthetic_dataset
+
+    def _generate_concurrently(self, jobs: List[Tuple], patterns_guide: str, max_workers: int, journal: CaseJournal):
+        """Run _generate_sample for every (slot, competency, panel, rng) job on a thread pool, journaling each result"""
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._generate_sample, competency, panel, patterns_guide, sample_rng, slot): slot
+                for slot, competency, panel, sample_rng in jobs
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Generating cases"):
+                try:
+                    sample = future.result()
+                except Exception as e:
+                    print(f"Error generating sample {futures[future]}: {e}")
+                    continue
+                if sample:
+                    journal.append(futures[future], sample)
+
+    @staticmethod
+    def _load_journal(journal_path: str) -> Dataset:
+        """Build the Dataset by streaming the journal through the JSON loader (rows in completion order)"""
+        if os.path.getsize(journal_path) == 0:
+            return Dataset.from_pandas(pd.DataFrame())
+        return Dataset.from_json(journal_path).remove_columns([SLOT_FIELD])
+
+    def generate_pipelined_dataset(self, num_samples: int = 200, seed: int = None, workers: Dict[str, int] = None,
+                                   queue_size: int = 32, journal_path: str = "accepted_journal.jsonl",
+                                   resume: bool = False, dedup_threshold: float = 0.8,
+                                   score_batch_size: int = 8) -> Dataset:
+        """Generate and quality-filter cases in one streaming pipeline
         
-        print("🔍 Quality filtering synthetic data...")
-        high_quality_samples = []
+        Each case flows through four stages connected by bounded queues:
+        generate the vignette -> score the vignette -> (if it passes) generate the clinical
+        response -> score the full case. Stages run concurrently, so the scorer starts on
+        the first case instead of waiting for the whole batch, and rejected vignettes never
+        pay for a clinician response. Accepted cases are journaled as in generate_synthetic_dataset.
+        
+        Unless dedup_threshold is None, a MinHash/LSH check right after generation drops
+        vignettes whose Prompt is a near duplicate of an original prompt or of an earlier
+        synthetic one, before any scoring call.
+        
+        The final score stage rates up to score_batch_size cases per request (as in
+        quality_filter_synthetic_data), starting on a partial batch when no more cases
+        arrive within a couple of seconds; score_batch_size=1 scores cases one by one.
+        
+        Every request passes its case slot to a CachedModel as the cache key, so a seeded run
+        replays regardless of thread scheduling. Batched scoring prompts still depend on which
+        cases arrive together; use score_batch_size=1 for a strict (replay=True) re-run.
+        """
+        workers = {"generate": 8, "screen": 4, "respond": 8, "score": 4, **(workers or {})}
+        journal = CaseJournal(journal_path, resume=resume)
+        done = list(journal)
+        
+        rng = random.Random(seed) if seed is not None else random
+        competency_distribution = [rng.choice(self.nursing_competencies) for _ in range(num_samples)]
+        panel_distribution = [rng.choice(self.clinical_panels) for _ in range(num_samples)]
+        slots = remaining_slots(list(zip(competency_distribution, panel_distribution)), done, num_samples)
+        if done:
+            print(f"♻️ Resuming from {journal_path}: {len(done)} cases done, {len(slots)} to go")
+        
+        patterns_guide = ""
+        if slots:
+            print("🔍 Analyzing original dataset patterns...")
+            patterns_guide = self.analyze_original_patterns()
+        
+        def generate(slot):
+            sample_rng = random.Random(f"{seed}:{slot}") if seed is not None else random
+            case_data = self.generate_synthetic_case(competency_distribution[slot], panel_distribution[slot], patterns_guide,
+                                                     sample_rng, slot)
+            return (slot, case_data) if case_data else None
+        
+        def dedup(item):
+            slot, case_data = item
+            duplicate_of = dedup_filter.check_and_add(f"synthetic_{slot}", case_data["Prompt"])
+            return item if duplicate_of is None else None
+        
+        def screen(item):
+            rating = self._score_vignette(item[1], item[0])
+            return item if rating is not None and rating >= QUALITY_THRESHOLD else None
         
-        for i, sample in enumerate(tqdm(synthetic_dataset, desc="Quality filtering")):
-            quality_prompt = f"""
+        def respond(item):
+            slot, case_data = item
+            clinical_response = self.generate_clinical_response(case_data["Prompt"], case_data, slot)
+            return (slot, self._to_row(case_data, clinical_response)) if clinical_response else None
+        
+        batch_fallbacks = []  # Single-case fallbacks per batch request (list.append is thread-safe)
+        
+        def score(items):
+            ratings, n_fallbacks = self._score_batch([row for _, row in items], [slot for slot, _ in items])
+            batch_fallbacks.append(n_fallbacks)
+            return [item if rating is not None and rating >= QUALITY_THRESHOLD else None
+                    for item, rating in zip(items, ratings)]
+        
+        def score_single(item):
+            rating = self._score_single(item[1], item[0])
+            return item if rating is not None and rating >= QUALITY_THRESHOLD else None
+        
+        stages = [
+            Stage("generate", generate, workers["generate"]),
+            Stage("screen", screen, workers["screen"]),
+            Stage("respond", respond, workers["respond"]),
+            Stage("score", score, workers["score"], batch_size=score_batch_size) if score_batch_size > 1
+            else Stage("score", score_single, workers["score"]),
+        ]
+        if dedup_threshold is not None:
+            # Reference prompts plus already journaled cases; one worker suffices (sub-millisecond checks)
+            dedup_filter = NearDuplicateFilter.from_texts(
+                list(self.original_dataset["Prompt"]) + [row["Prompt"] for row in done], threshold=dedup_threshold
+            )
+            stages.insert(1, Stage("dedup", dedup, 1))
+        print(f"🏭 Pipelining {len(slots)} cases through {' -> '.join(stage.name for stage in stages)}...")
+        start = time.perf_counter()
+        stats = run_pipeline(slots, stages, queue_size=queue_size, on_output=lambda item: journal.append(*item))
+        elapsed = time.perf_counter() - start
+        journal.close()
+        
+        for stage in stages:
+            print(f"   {stage.name}: {stats[stage.name]['in']} in, {stats[stage.name]['out']} passed, "
+                  f"{stats[stage.name]['busy_s'] / stage.workers:.1f}s busy per worker")
+        if score_batch_size > 1:
+            print(f"📡 Scoring requests: {len(batch_fallbacks)} batches + {sum(batch_fallbacks)} "
+                  f"single-case fallbacks (vs {stats['score']['in']} unbatched)")
+        slowest, floor = bottleneck(stats, stages)
+        print(f"⏱️ Pipeline took {elapsed:.1f}s (slowest stage '{slowest}': {floor:.1f}s per worker)")
+        self.pipeline_stats = stats
+        
+        synthetic_dataset = self._load_journal(journal_path)
+        print(f"📊 Kept {len(synthetic_dataset)} high-quality samples")
+        return synthetic_dataset
+
+    def _score_vignette(self, case_data: Dict[str, str], slot=None) -> float:
+        """Rate a generated vignette before any clinician response is paid for (None on failure)"""
+        vignette_prompt = f"""
+            Evaluate this synthetic Kenyan healthcare case vignette for authenticity and quality:
+
+            PROMPT: {case_data['Prompt']}
+            DDX SNOMED: {case_data['DDX SNOMED']}
+
+            Rate on a scale of 1-10 considering:
+            1. Clinical accuracy and realism
+            2. Appropriate complexity for the {case_data['Health level']}
+            3. Authentic Kenyan healthcare context (e.g., {case_data['County']} setting)
+            4. Realistic resource constraints
+            5. Clear clinical questions that require reasoning
+            6. Relevance of DDX SNOMED codes to the clinical scenario
+
+            Provide only a single number (1-10) as your rating.
+            """
+        try:
+            response = self._generate(vignette_prompt, slot)
+            return float(response.text.strip())
+        except Exception as e:
+            print(f"Error rating vignette {case_data.get('Master_Index', '')}: {e}")
+            return None
+
+    def _quality_prompt(self, sample) -> str:
+        return f"""
             Evaluate this synthetic Kenyan healthcare case for authenticity and quality:
 
             PROMPT: {sample['Prompt']}
@@ -249,21 +463,118 @@ class KenyanHealthcareSyntheticDataGenerator:
 
             Provide only a single number (1-10) as your rating.
             """
-            
-            try:
-                response = model.generate_content(quality_prompt)
-                rating = float(response.text.strip())
+
+    def _score_single(self, sample, slot=None) -> float:
+        """Rate one case; returns None when the request or parsing fails"""
+        try:
+            response = self._generate(self._quality_prompt(sample), slot)
+            return float(response.text.strip())
+        except Exception as e:
+            print(f"Error rating sample {sample.get('Master_Index', '')}: {e}")
+            return None
+
+    def _batch_quality_prompt(self, samples: List[Dict]) -> str:
+        cases = "\n\n".join(
+            f"""CASE ID: C{i}
+            HEALTH LEVEL: {sample['Health level']} | COUNTY: {sample['County']}
+            PROMPT: {sample['Prompt']}
+            RESPONSE: {sample['Clinician']}
+            DDX SNOMED: {sample['DDX SNOMED']}"""
+            for i, sample in enumerate(samples)
+        )
+        return f"""
+            Evaluate each of these synthetic Kenyan healthcare cases for authenticity and quality.
+
+            {cases}
+
+            Rate every case independently on a scale of 1-10 considering:
+            1. Clinical accuracy and realism
+            2. Appropriate complexity for its health level
+            3. Authentic Kenyan healthcare context for its county
+            4. Realistic resource constraints
+            5. Cultural sensitivity and alignment with Kenyan medical practices
+            6. Relevance of DDX SNOMED codes to the clinical scenario
+
+            Return only JSON of the form {{"scores": [{{"id": "C0", "score": 8}}, ...]}} with one entry per CASE ID.
+            """
+
+    @staticmethod
+    def _parse_batch_scores(text: str, n_cases: int) -> Dict[int, float]:
+        """Map case position -> score from a batch response; raises ValueError if it does not parse"""
+        text = text.strip()
+        if text.startswith("```"):
+            text = text.strip("`").split("\n", 1)[-1]
+        entries = json.loads(text)["scores"]
+        scores = {}
+        for entry in entries:
+            position = int(str(entry["id"]).lstrip("Cc"))
+            if 0 <= position < n_cases:
+                scores[position] = float(entry["score"])
+        return scores
+
+    def _score_batch(self, samples: List[Dict], slots: List = None) -> Tuple[List[float], int]:
+        """Score several cases in one request, falling back to single-case scoring if the reply does not parse
+        
+        slots are the cases' ids; together they key the batch request in a CachedModel.
+        Returns the scores and the number of cases that needed a single-case request.
+        """
+        slots = slots if slots is not None else [None] * len(samples)
+        batch_slot = ",".join(map(str, slots)) if None not in slots else None
+        try:
+            response = self._generate(
+                self._batch_quality_prompt(samples),
+                batch_slot,
+                generation_config={"response_mime_type": "application/json"}
+            )
+            scores = self._parse_batch_scores(response.text, len(samples))
+        except Exception as e:
+            print(f"Batch rating failed, scoring {len(samples)} cases one by one: {e}")
+            scores = {}
+        
+        missing = [i for i in range(len(samples)) if i not in scores]
+        for i in missing:
+            scores[i] = self._score_single(samples[i], slots[i])
+        return [scores[i] for i in range(len(samples))], len(missing)
+
+    def quality_filter_synthetic_data(self, synthetic_dataset: Dataset, batch_size: int = 8, max_workers: int = None) -> Dataset:
+        """Filter synthetic data for quality using Gemini
+        
+        With batch_size > 1 (the default), several cases are rated per request (JSON scores
+        per case id), and batches run concurrently on max_workers threads. batch_size=1 keeps
+        the original one request per case.
+        """
+        max_workers = max_workers or self.max_workers
+        
+        print("🔍 Quality filtering synthetic data...")
+        high_quality_samples = []
+        
+        if batch_size > 1:
+            samples = list(synthetic_dataset)
+            starts = range(0, len(samples), batch_size)
+            batches = [samples[i:i + batch_size] for i in starts]
+            # Dataset positions as slots: the cache keys do not depend on which thread runs first
+            batch_slots = [list(range(i, min(i + batch_size, len(samples)))) for i in starts]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(tqdm(executor.map(self._score_batch, batches, batch_slots), total=len(batches),
+                                    desc="Quality filtering"))
+            for batch, (scores, _) in zip(batches, results):
+                high_quality_samples.extend(
+                    sample for sample, rating in zip(batch, scores)
+                    if rating is not None and rating >= QUALITY_THRESHOLD
+                )
+            n_fallbacks = sum(n for _, n in results)
+            print(f"📡 Scoring requests: {len(batches)} batches + {n_fallbacks} single-case fallbacks "
+                  f"(vs {len(samples)} unbatched)")
+        else:
+            for i, sample in enumerate(tqdm(synthetic_dataset, desc="Quality filtering")):
+                rating = self._score_single(sample, i)
                 
-                if rating >= 7.0:  # Keep high-quality samples
+                if rating is not None and rating >= QUALITY_THRESHOLD:  # Keep high-quality samples
                     high_quality_samples.append(sample)
-                    
-            except Exception as e:
-                print(f"Error rating sample {i}: {e}")
-                continue
-            
-            # Rate limiting
-            if i % 10 == 0:
-                time.sleep(2)
+                
+                # Rate limiting
+                if i % 10 == 0:
+                    time.sleep(2)
 
         print(f"📊 Kept {len(high_quality_samples)} high-quality samples out of {len(synthetic_dataset)}")
         return Dataset.from_pandas(pd.DataFrame(high_quality_samples))
@@ -273,14 +584,16 @@ def main():
     df = pd.read_csv("/kaggle/input/updated-kenya-clinical-reasoning-challenge-dataset/train.csv")  # Adjust path as needed
     train_dataset = Dataset.from_pandas(df)
     
-    # Initialize generator
-    generator = KenyanHealthcareSyntheticDataGenerator(train_dataset)
-    
-    # Generate synthetic data
-    synthetic_dataset = generator.generate_synthetic_dataset(num_samples=300)
+    # Initialize generator (concurrent calls, paced by the API quota; cached responses skip the quota)
+    limited = RateLimitedModel(get_gemini_model(), requests_per_minute=GEMINI_RPM, tokens_per_minute=GEMINI_TPM)
+    llm = CachedModel(limited, path=GEMINI_CACHE_PATH)
+    generator = KenyanHealthcareSyntheticDataGenerator(train_dataset, llm=llm, max_workers=16)
     
-    # Quality filter
-    filtered_synthetic = generator.quality_filter_synthetic_data(synthetic_dataset)
+    # Generate and quality-filter synthetic data in one pipeline (seeded so re-runs hit the cache;
+    # resumes from the journal after a crash)
+    filtered_synthetic = generator.generate_pipelined_dataset(num_samples=300, seed=42, resume=True)
+    print(f"📡 API usage: {limited.stats}")
+    print(f"🗃️ Response cache: {llm.stats} (hit rate {llm.hit_rate():.0%})")
     
     # Combine with original data
     from datasets import concatenate_datasets
@@ -294,7 +607,22 @@ def main():
     
     return augmented_dataset
 
-def generate_few_shot_synthetic_data(original_dataset, num_samples=100):
+def load_test(num_samples=100, max_workers=16, latency=0.5, requests_per_minute=600):
+    """Measure sequential vs concurrent generation throughput offline against a StubModel"""
+    original = {"Prompt": ["I am a nurse with 10 years of experience in a Level 4 hospital..."] * 10}
+    report = {}
+    for workers in [1, max_workers]:
+        stub = StubModel(latency=latency, quota_per_minute=requests_per_minute)
+        llm = RateLimitedModel(stub, requests_per_minute=requests_per_minute, base_delay=0.5)
+        generator = KenyanHealthcareSyntheticDataGenerator(original, llm=llm, max_workers=workers)
+        start = time.perf_counter()
+        dataset = generator.generate_synthetic_dataset(num_samples=num_samples, journal_path="load_test_journal.jsonl")
+        elapsed = time.perf_counter() - start
+        report[workers] = {"seconds": elapsed, "samples": len(dataset), "requests_per_minute": llm.stats["requests"] / elapsed * 60, **llm.stats}
+        print(f"⏱️ {workers} worker(s): {elapsed:.1f}s for {len(dataset)} samples ({report[workers]['requests_per_minute']:.0f} requests/min)")
+    return report
+
+def generate_few_shot_synthetic_data(original_dataset, num_samples=100, llm=None):
     """Generate synthetic data using few-shot examples"""
     
     # Select diverse examples from original dataset
@@ -326,7 +654,7 @@ def generate_few_shot_synthetic_data(original_dataset, num_samples=100):
     """
     
     try:
-        response = model.generate_content(few_shot_prompt)
+        response = (llm or get_gemini_model()).generate_content(few_shot_prompt)
         return response.text
     except Exception as e:
         print(f"Error in few-shot generation: {e}")
@@ -0,0 +1,277 @@
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Sampler
+from transformers import DataCollatorForSeq2Seq, Seq2SeqTrainer
+
+from text_normalizer import normalize_texts
+
+MAX_SOURCE_LENGTH = 512
+MAX_TARGET_LENGTH = 128
+TASK_PREFIX = "summarize: "
+
+
+def make_unpadded_tokenize_function(tokenizer,
+                                    max_source_length: int = MAX_SOURCE_LENGTH,
+                                    max_target_length: int = MAX_TARGET_LENGTH,
+                                    prefix: str = TASK_PREFIX) -> Callable[[Dict[str, list]], Dict[str, list]]:
+    """
+    Batched ``Dataset.map`` function like the notebook's tokenize_function, minus the padding.
+
+    Sources and targets are truncated to the same limits but stored at
+    their own length; DataCollatorForSeq2Seq then pads each batch to its
+    longest item (labels with -100, as the notebook does by hand).
+    """
+    def tokenize_function(examples: Dict[str, list]) -> Dict[str, list]:
+        inputs = tokenizer(
+            [prefix + text for text in examples['Enhanced_Prompt']],
+            max_length=max_source_length,
+            truncation=True
+        )
+        labels = tokenizer(
+            text_target=examples['Clinician'],
+            max_length=max_target_length,
+            truncation=True
+        )
+        return {
+            'input_ids': inputs['input_ids'],
+            'attention_mask': inputs['attention_mask'],
+            'labels': labels['input_ids']
+        }
+
+    return tokenize_function
+
+
+def sequence_lengths(dataset, column: str = 'input_ids') -> np.ndarray:
+    """Token count of every example in a tokenized (unpadded) dataset."""
+    return np.fromiter((len(ids) for ids in dataset[column]), dtype=np.int64, count=len(dataset))
+
+
+class LengthBucketSampler(Sampler):
+    """
+    Yields example indices so that consecutive ``batch_size`` groups have similar lengths.
+
+    For training (``shuffle=True``), each epoch shuffles the data, cuts it
+    into buckets of ``bucket_batches`` batches, sorts every bucket by length
+    and shuffles the resulting batches, so batch composition still varies
+    between epochs. The longest batch is moved first so an out-of-memory
+    error shows up at the first step, and the one short batch stays last,
+    so DataLoader batches line up with the sampler's. Without shuffling
+    (eval and generation), indices are simply sorted longest first.
+
+    Args:
+        lengths: Length of every example (e.g. from sequence_lengths)
+        batch_size: DataLoader batch size
+        bucket_batches: Batches per sorting bucket; larger gives tighter padding, less randomness
+        shuffle: Randomize buckets and batch order
+        seed: Base seed; the epoch is added to it
+    """
+
+    def __init__(self, lengths: Sequence[int], batch_size: int, bucket_batches: int = 50,
+                 shuffle: bool = True, seed: int = 42):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.bucket_batches = bucket_batches
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def batches(self) -> List[np.ndarray]:
+        """Index batches in yield order."""
+        if not self.shuffle:
+            order = np.argsort(-self.lengths, kind='stable')
+            return [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+
+        rng = np.random.default_rng(self.seed + self.epoch)
+        permutation = rng.permutation(len(self.lengths))
+        bucket_size = self.batch_size * self.bucket_batches
+        batches = []
+        for start in range(0, len(permutation), bucket_size):
+            bucket = permutation[start:start + bucket_size]
+            bucket = bucket[np.argsort(-self.lengths[bucket], kind='stable')]
+            batches.extend(bucket[i:i + self.batch_size] for i in range(0, len(bucket), self.batch_size))
+
+        short = [b for b in batches if len(b) < self.batch_size]
+        full = [batches[i] for i in rng.permutation(len(batches)) if len(batches[i]) == self.batch_size]
+        if full:
+            longest = max(range(len(full)), key=lambda i: self.lengths[full[i]].max())
+            full[0], full[longest] = full[longest], full[0]
+        return full + short
+
+    def __iter__(self) -> Iterator[int]:
+        batches = self.batches()
+        if self.shuffle:
+            # Still vary the batches when the trainer does not call set_epoch
+            self.epoch += 1
+        for batch in batches:
+            yield from batch.tolist()
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+
+class BucketedSeq2SeqTrainer(Seq2SeqTrainer):
+    """
+    Seq2SeqTrainer that batches by source length for training and evaluation.
+
+    Use it with a dataset tokenized by make_unpadded_tokenize_function and
+    a DataCollatorForSeq2Seq. Only evaluate() batches longest first, so its
+    predictions come back permuted relative to the dataset (compute_metrics
+    still pairs predictions and labels correctly, but do not map
+    EvalPrediction rows back to dataset rows by position). predict() keeps
+    the default sequential sampler, so its outputs are in dataset order.
+    """
+
+    def __init__(self, *args, bucket_batches: int = 50, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bucket_batches = bucket_batches
+        self._predicting = False
+
+    def predict(self, *args, **kwargs):
+        # predict() builds its loader through _get_eval_sampler too; keep its rows in order
+        self._predicting = True
+        try:
+            return super().predict(*args, **kwargs)
+        finally:
+            self._predicting = False
+
+    def _get_train_sampler(self, *args, **kwargs):
+        dataset = args[0] if args else kwargs.get('train_dataset')
+        dataset = dataset if dataset is not None else self.train_dataset
+        return LengthBucketSampler(sequence_lengths(dataset), self.args.train_batch_size,
+                                   bucket_batches=self.bucket_batches, seed=self.args.seed)
+
+    def _get_eval_sampler(self, eval_dataset):
+        if self._predicting:
+            return super()._get_eval_sampler(eval_dataset)
+        return LengthBucketSampler(sequence_lengths(eval_dataset), self.args.eval_batch_size, shuffle=False)
+
+
+def generate_in_length_order(generate_fn: Callable[..., List[str]],
+                             prompts: List[str],
+                             tokenizer,
+                             batch_size: int = 16,
+                             prefix: str = TASK_PREFIX,
+                             **kwargs) -> List[str]:
+    """
+    Run a batched generation function (e.g. the notebook's generate_predictions)
+    on prompts sorted by token length, and return results in the original order.
+
+    generate_predictions already pads each batch to its longest prompt;
+    sorting makes the prompts within a batch similar in length, so that
+    padding (and the beams generated over it) mostly disappears.
+    """
+    texts = [prefix + text for text in normalize_texts(prompts)]
+    lengths = np.array([len(ids) for ids in tokenizer(texts, truncation=True, max_length=MAX_SOURCE_LENGTH)['input_ids']])
+    order = np.argsort(-lengths, kind='stable')
+    results = generate_fn([prompts[i] for i in order], tokenizer=tokenizer, batch_size=batch_size, **kwargs)
+
+    restored = [None] * len(prompts)
+    for position, result in zip(order, results):
+        restored[position] = result
+    return restored
+
+
+def padding_stats(lengths: Sequence[int], batch_size: int, max_length: int = MAX_SOURCE_LENGTH,
+                  bucket_batches: int = 50, seed: int = 42) -> Dict[str, Dict[str, float]]:
+    """
+    Padding efficiency of fixed, per-batch and bucketed padding for one epoch.
+
+    For each strategy: real/padded token ratio, padded token count, and the
+    sum of batch * length^2 (the self-attention cost); ``speedup`` entries
+    divide the fixed-padding cost by each strategy's cost.
+    """
+    lengths = np.minimum(np.asarray(lengths), max_length)
+    rng = np.random.default_rng(seed)
+    random_order = rng.permutation(len(lengths))
+    dynamic = [lengths[random_order[i:i + batch_size]] for i in range(0, len(lengths), batch_size)]
+    strategies = {
+        'max_length': [np.full(len(b), max_length) for b in dynamic],
+        'dynamic': dynamic,
+        'bucketed': [lengths[b] for b in LengthBucketSampler(lengths, batch_size, bucket_batches, seed=seed).batches()],
+    }
+
+    report = {}
+    real = int(lengths.sum())
+    for name, batches in strategies.items():
+        padded = sum(len(b) * int(b.max()) for b in batches)
+        attention = sum(len(b) * int(b.max()) ** 2 for b in batches)
+        report[name] = {'efficiency': real / padded, 'padded_tokens': padded, 'attention_cost': attention}
+    for name in strategies:
+        report[name]['token_speedup'] = report['max_length']['padded_tokens'] / report[name]['padded_tokens']
+        report[name]['attention_speedup'] = report['max_length']['attention_cost'] / report[name]['attention_cost']
+    return report
+
+
+def time_epoch(model, dataset, collator, batch_size: int, sampler: Optional[Sampler] = None,
+               max_steps: Optional[int] = None, device: Optional[str] = None) -> float:
+    """
+    Seconds for forward + backward over ``dataset`` (or its first ``max_steps`` batches).
+
+    Gradients are cleared after every step and no optimizer step is taken,
+    so the model is left unchanged.
+    """
+    device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+    loader = DataLoader(dataset, batch_size=batch_size, sampler=sampler, collate_fn=collator)
+    model.to(device).train()
+    start = time.perf_counter()
+    for step, batch in enumerate(loader):
+        if max_steps is not None and step >= max_steps:
+            break
+        batch = {k: v.to(device) for k, v in batch.items()}
+        model(**batch).loss.backward()
+        model.zero_grad(set_to_none=True)
+    if device == 'cuda':
+        torch.cuda.synchronize()
+    return time.perf_counter() - start
+
+
+def compare_epoch_time(model, tokenizer, dataset, batch_size: int = 4,
+                       max_source_length: int = MAX_SOURCE_LENGTH, max_target_length: int = MAX_TARGET_LENGTH,
+                       max_steps: Optional[int] = None) -> Dict[str, float]:
+    """
+    Time an epoch with max-length padding (the notebook's setup), per-batch
+    padding in random order, and length-bucketed batches.
+
+    Args:
+        model: Seq2seq model (e.g. T5ForConditionalGeneration)
+        tokenizer: Its tokenizer
+        dataset: Dataset tokenized by make_unpadded_tokenize_function
+        batch_size: Per-step batch size
+        max_source_length, max_target_length: Fixed padding lengths of the baseline
+        max_steps: Optional cap on batches per run (same for all three)
+
+    Returns:
+        Seconds per strategy and speedups relative to max-length padding
+    """
+    dynamic = DataCollatorForSeq2Seq(tokenizer=tokenizer, model=model)
+    lengths = sequence_lengths(dataset)
+
+    def fixed(features):
+        # Same tensors as the notebook's padding='max_length' tokenize_function
+        def pad(key, length, value):
+            return torch.tensor([f[key] + [value] * (length - len(f[key])) for f in features])
+        return {
+            'input_ids': pad('input_ids', max_source_length, tokenizer.pad_token_id),
+            'attention_mask': pad('attention_mask', max_source_length, 0),
+            'labels': pad('labels', max_target_length, -100),
+        }
+
+    report = {
+        'max_length_s': time_epoch(model, dataset, fixed, batch_size,
+                                   LengthBucketSampler(lengths, batch_size, bucket_batches=1), max_steps),
+        'dynamic_s': time_epoch(model, dataset, dynamic, batch_size,
+                                LengthBucketSampler(lengths, batch_size, bucket_batches=1), max_steps),
+        'bucketed_s': time_epoch(model, dataset, dynamic, batch_size,
+                                 LengthBucketSampler(lengths, batch_size), max_steps),
+    }
+    report['dynamic_speedup'] = report['max_length_s'] / report['dynamic_s']
+    report['bucketed_speedup'] = report['max_length_s'] / report['bucketed_s']
+    print(f"⏱️ Epoch: max-length padding {report['max_length_s']:.1f}s, per-batch padding {report['dynamic_s']:.1f}s "
+          f"({report['dynamic_speedup']:.2f}x), bucketed {report['bucketed_s']:.1f}s ({report['bucketed_speedup']:.2f}x)")
+    return report
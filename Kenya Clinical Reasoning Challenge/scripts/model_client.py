@@ -0,0 +1,191 @@
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+RETRYABLE_CODES = {429, 500, 503}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at ``rate_per_minute``.
+
+    The default capacity allows a burst of 10 seconds' worth of tokens, so
+    a cold start cannot spend a whole minute's quota at once.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, rate_per_minute / 6)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0):
+        """Block until ``amount`` tokens are available, then take them."""
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) tokens without waiting; may go negative."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """True for rate-limit (429) and transient server errors."""
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)
+    if code in RETRYABLE_CODES:
+        return True
+    text = f"{type(error).__name__} {error}"
+    return "ResourceExhausted" in text or "429" in text or "ServiceUnavailable" in text
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class RateLimitedModel:
+    """
+    Wrap a model's generate_content with RPM/TPM token buckets and retries.
+
+    Safe to share across threads: each call waits for one request token and
+    its estimated prompt + output tokens, and on 429/5xx errors retries with
+    exponential backoff and jitter. When the response reports usage, the
+    token bucket is corrected to the actual count.
+    """
+
+    def __init__(self,
+                 model,
+                 requests_per_minute: float = 150,
+                 tokens_per_minute: float = 2_000_000,
+                 expected_output_tokens: int = 800,
+                 max_retries: int = 6,
+                 base_delay: float = 2.0,
+                 max_delay: float = 60.0):
+        self.model = model
+        self.model_name = getattr(model, "model_name", type(model).__name__)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.expected_output_tokens = expected_output_tokens
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "tokens": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def generate_content(self, prompt, **kwargs):
+        estimated = estimate_tokens(str(prompt)) + self.expected_output_tokens
+        for attempt in range(self.max_retries + 1):
+            self.requests.acquire()
+            self.tokens.acquire(estimated)
+            self._count("requests")
+            try:
+                response = self.model.generate_content(prompt, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable_error(e):
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                continue
+
+            usage = getattr(response, "usage_metadata", None)
+            actual = getattr(usage, "total_token_count", None)
+            if actual:
+                self.tokens.adjust(actual - estimated)
+            self._count("tokens", actual or estimated)
+            return response
+
+
+class StubRateLimitError(Exception):
+    """429 raised by StubModel to exercise the retry path."""
+    code = 429
+
+
+class StubModel:
+    """
+    Offline stand-in for genai.GenerativeModel, for load tests and dry runs.
+
+    Answers the generator's prompts with well-formed canned text after a
+    simulated latency, and can enforce its own requests-per-minute quota by
+    raising 429 errors, like the real API.
+    """
+
+    def __init__(self,
+                 latency: float = 0.5,
+                 jitter: float = 0.2,
+                 quota_per_minute: Optional[float] = None,
+                 responder: Optional[Callable[[str], str]] = None,
+                 seed: int = 42):
+        self.model_name = "stub"
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.responder = responder or (lambda prompt: default_stub_responder(prompt, self.rng))
+        self.quota = TokenBucket(quota_per_minute) if quota_per_minute else None
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        with self.lock:
+            self.calls += 1
+            delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+            allowed = True
+            if self.quota is not None:
+                self.quota._refill()
+                allowed = self.quota.tokens >= 1
+                if allowed:
+                    self.quota.tokens -= 1
+        if not allowed:
+            raise StubRateLimitError("429 Resource has been exhausted (stub quota)")
+        time.sleep(max(0.0, delay))
+        text = self.responder(str(prompt))
+        usage = SimpleNamespace(total_token_count=estimate_tokens(str(prompt)) + estimate_tokens(text))
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+def default_stub_responder(prompt: str, rng: random.Random = random) -> str:
+    """Canned answers shaped like the generator's expected outputs, drawn from ``rng`` (the stub's seeded one)."""
+    if "OUTPUT FORMAT" in prompt and "DDX SNOMED" in prompt:
+        index = re.search(r"Master_Index: (\S+)", prompt)
+        competency = re.search(r"Nursing Competency: (.+)", prompt)
+        return (
+            f"Master_Index: {index.group(1) if index else 'ID_STUB'}\n"
+            f"Prompt: I am a nurse working with a patient presenting with fever and cough "
+            f"({competency.group(1).strip() if competency else 'general'}). "
+            f"Case {rng.randint(0, 10**9)}. What is the immediate management?\n"
+            f"DDX SNOMED: 233604007, 195967001"
+        )
+    if '{"scores"' in prompt:
+        ids = re.findall(r"CASE ID: (\S+)", prompt)
+        return json.dumps({"scores": [{"id": case_id, "score": rng.randint(5, 10)} for case_id in ids]})
+    if "Rate on a scale" in prompt:
+        return str(rng.randint(5, 10))
+    if "Analyze these authentic" in prompt:
+        return "Cases open with the nurse's experience and facility, then demographics, vitals and 2-3 questions."
+    return "Assess ABCs, take vitals, start first-line management per Kenyan guidelines and refer if unstable."
+
@@ -0,0 +1,176 @@
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def shingles(text: str, size: int = 3) -> List[str]:
+    """Word ``size``-grams of the lowercased alphanumeric tokens (the whole text if shorter)."""
+    words = _WORD.findall(str(text).lower())
+    if len(words) <= size:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows) with bands * rows <= num_perm minimizing the LSH error.
+
+    Weighs equally the probability mass of candidate pairs below
+    ``threshold`` (false positives) and missed pairs above it (false negatives).
+    """
+    def area(f, lo, hi):
+        s = np.linspace(lo, hi, 201)
+        return f(s).mean() * (hi - lo)
+
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_pos = area(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)
+            false_neg = area(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)
+            if false_pos + false_neg < best_error:
+                best, best_error = (bands, rows), false_pos + false_neg
+    return best
+
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate detector over MinHash signatures and an LSH index.
+
+    Each text is reduced to a ``num_perm``-value MinHash signature of its
+    word shingles; the signature is split into bands, and texts sharing any
+    band bucket become candidates, confirmed by their estimated Jaccard
+    similarity. Lookups touch only the matching buckets, so cost per check
+    stays flat as the index grows. Thread-safe.
+
+    Args:
+        threshold: Estimated Jaccard similarity at or above which texts are duplicates
+        num_perm: MinHash permutations (signature length)
+        shingle_size: Words per shingle
+        seed: Seed of the permutation parameters
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.stats = {"checked": 0, "duplicates": 0, "check_s": 0.0}
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], keys: Optional[Iterable[str]] = None, **kwargs) -> "NearDuplicateFilter":
+        """Index reference texts (e.g. the train.csv prompts) without checking them."""
+        index = cls(**kwargs)
+        texts = list(texts)
+        keys = list(keys) if keys is not None else [f"ref_{i}" for i in range(len(texts))]
+        for key, text in zip(keys, texts):
+            index.add(key, text)
+        return index
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles(text, self.shingle_size)), dtype=np.uint64
+        )
+        # Universal hashing (a*h + b) mod p per permutation; products wrap in uint64 like datasketch
+        permuted = (hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _insert(self, key: str, signature: np.ndarray, band_keys: List[bytes]):
+        self._signatures[key] = signature
+        for bucket, band_key in zip(self._buckets, band_keys):
+            bucket[band_key].append(key)
+
+    def _matches(self, signature: np.ndarray, band_keys: List[bytes]) -> List[Tuple[str, float]]:
+        candidates = {key for bucket, band_key in zip(self._buckets, band_keys) for key in bucket.get(band_key, ())}
+        matches = []
+        for key in candidates:
+            similarity = float(np.mean(self._signatures[key] == signature))
+            if similarity >= self.threshold:
+                matches.append((key, similarity))
+        return sorted(matches, key=lambda m: -m[1])
+
+    def add(self, key: str, text: str):
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            self._insert(key, signature, band_keys)
+
+    def query(self, text: str) -> List[Tuple[str, float]]:
+        """Indexed (key, estimated similarity) pairs at or above the threshold, most similar first."""
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            return self._matches(signature, band_keys)
+
+    def check_and_add(self, key: str, text: str) -> Optional[str]:
+        """
+        Return the key of the most similar indexed text if ``text`` is a near duplicate;
+        otherwise index it under ``key`` and return None.
+
+        Checking and inserting happen under one lock, so of two near-identical
+        texts checked concurrently, only the first is admitted.
+        """
+        start = time.perf_counter()
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            matches = self._matches(signature, band_keys)
+            if not matches:
+                self._insert(key, signature, band_keys)
+            self.stats["checked"] += 1
+            self.stats["duplicates"] += bool(matches)
+            self.stats["check_s"] += time.perf_counter() - start
+        return matches[0][0] if matches else None
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+
+def benchmark_filter(reference_texts: List[str], n_checks: int = 1000, threshold: float = 0.8, seed: int = 42) -> Dict:
+    """
+    Time indexing ``reference_texts`` and checking lightly edited copies plus shuffled (novel) texts.
+
+    Returns:
+        Dict with index time, mean check time in ms, and the duplicate rate
+        on edited copies (should be ~1) and on novel texts (should be ~0)
+    """
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    index = NearDuplicateFilter.from_texts(reference_texts, threshold=threshold)
+    index_s = time.perf_counter() - start
+
+    def edit(text: str) -> str:
+        words = text.split()
+        i = int(rng.integers(len(words))) if words else 0
+        return " ".join(words[:i] + ["additionally"] + words[i:])
+
+    def shuffle(text: str) -> str:
+        words = text.split()
+        rng.shuffle(words)
+        return " ".join(words)
+
+    picks = rng.integers(len(reference_texts), size=n_checks)
+    report = {"n_reference": len(reference_texts), "index_s": index_s}
+    for name, transform in [("edited", edit), ("novel", shuffle)]:
+        start = time.perf_counter()
+        hits = sum(bool(index.query(transform(reference_texts[i]))) for i in picks)
+        report[f"{name}_check_ms"] = (time.perf_counter() - start) / n_checks * 1000
+        report[f"{name}_duplicate_rate"] = hits / n_checks
+    return report
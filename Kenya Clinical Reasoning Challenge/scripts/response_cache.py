@@ -0,0 +1,148 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Optional
+
+
+class CacheMissError(KeyError):
+    """Raised by CachedModel in replay mode when a prompt has no cached response."""
+
+
+def _normalize_config(config) -> str:
+    """Stable JSON text for a generation config (dict, GenerationConfig or None)."""
+    if config is None:
+        return ""
+    if not isinstance(config, dict):
+        config = getattr(config, "__dict__", None) or str(config)
+    return json.dumps(config, sort_keys=True, default=str)
+
+
+class CachedModel:
+    """
+    SQLite-backed response cache in front of a model's generate_content.
+
+    Entries are keyed by model name, generation config and a SHA-256 hash of
+    the prompt, plus a slot telling repeated sends of the same prompt apart
+    (e.g. to sample different cases). Concurrent callers should pass
+    generate_content(..., cache_slot=<case id>) so that every request keeps
+    the same key whatever order threads arrive in. Without a cache_slot the
+    prompt's occurrence count within this run is used, which only replays
+    deterministically for sequential callers. Wrap the RateLimitedModel
+    rather than the raw model, so cache hits skip the quota.
+
+    Args:
+        model: Any object with generate_content (Gemini model, RateLimitedModel, StubModel)
+        path: SQLite file; created on first use
+        ttl: Seconds after which an entry counts as a miss (None keeps entries forever)
+        max_entries: Least recently used entries beyond this count are evicted
+        replay: Strict replay mode; misses raise CacheMissError instead of calling the model
+    """
+
+    def __init__(self,
+                 model,
+                 path: str = "gemini_cache.sqlite",
+                 ttl: Optional[float] = None,
+                 max_entries: Optional[int] = 50_000,
+                 replay: bool = False):
+        self.model = model
+        self.model_name = getattr(model, "model_name", type(model).__name__)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.replay = replay
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+        self._occurrences = Counter()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, text TEXT, created REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._evict()
+        self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries beyond max_entries (caller holds the lock)."""
+        if self.max_entries is None:
+            return
+        evicted = self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        self.stats["evicted"] += max(evicted, 0)
+
+    def _key(self, prompt, config, slot=None) -> str:
+        digest = hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()
+        base = f"{self.model_name}\x00{_normalize_config(config)}\x00{digest}"
+        if slot is not None:
+            return hashlib.sha256(f"{base}\x00slot:{slot}".encode("utf-8")).hexdigest()
+        with self._lock:
+            occurrence = self._occurrences[base]
+            self._occurrences[base] += 1
+        return hashlib.sha256(f"{base}\x00{occurrence}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT text, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            text, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.stats["expired"] += 1
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return text
+
+    def _store(self, key: str, text: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, text, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, self.model_name, text, now, now)
+            )
+            self._evict()
+            self._db.commit()
+
+    def generate_content(self, prompt, cache_slot=None, **kwargs):
+        key = self._key(prompt, kwargs.get("generation_config"), cache_slot)
+        text = self._lookup(key)
+        if text is not None:
+            with self._lock:
+                self.stats["hits"] += 1
+            return SimpleNamespace(text=text, usage_metadata=None, cached=True)
+
+        with self._lock:
+            self.stats["misses"] += 1
+        if self.replay:
+            raise CacheMissError(f"No cached response for prompt {key[:12]} (replay mode)")
+
+        response = self.model.generate_content(prompt, **kwargs)
+        # Only successful text responses are cached; errors propagate uncached
+        self._store(key, response.text)
+        return response
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def close(self):
+        self._db.close()
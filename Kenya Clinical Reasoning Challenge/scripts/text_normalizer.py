@@ -0,0 +1,283 @@
+import re
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# Measurement and percentage patterns of the notebook's preprocess_text, fused into one compiled pass
+_QUANTITY = re.compile(r'(\d+)\s*(?:(mg|mgs|mcg|µg|ml|mls)|percent|pct)')
+_AGE = re.compile(r'(\d+)[- ]?(?:year|yr)[- ]old')
+_GENDER = re.compile(r'\b(male|female|man|woman)\b')
+_PROMPT_PREFIX = "Based on clinical reasoning, provide a concise professional assessment for: "
+
+
+class _PunctuationTable(dict):
+    """
+    str.translate table mapping every character that is neither alphanumeric
+    nor whitespace to a space (and newlines to spaces).
+
+    Entries are filled lazily on first sight of a code point, so the table
+    covers all of Unicode without materializing it; lookups after that stay
+    in C.
+    """
+
+    def __missing__(self, codepoint: int):
+        char = chr(codepoint)
+        value = codepoint if char.isalnum() or char.isspace() else 32
+        self[codepoint] = value
+        return value
+
+
+_TABLE = _PunctuationTable({ord('\n'): 32})
+for _codepoint in range(128):
+    _TABLE[_codepoint]
+
+
+def _format_quantity(match: re.Match) -> str:
+    number, unit = match.group(1), match.group(2)
+    return f"{number} {unit}" if unit else f"{number}%"
+
+
+def normalize_text(text: str) -> str:
+    """
+    Same output as the notebook's preprocess_text, without the per-character join.
+
+    The abbreviation pass (``~DOT~``) is omitted: it only matches periods,
+    and every period has already been replaced by a space at that point,
+    so it never changes the text. The measurement and percentage passes
+    run as one regex: a digit run is followed by either a unit or a
+    percent word, never both, so one scan finds the same matches as two.
+    """
+    if not isinstance(text, str):
+        return ""
+    text = text.lower().translate(_TABLE)
+    text = _QUANTITY.sub(_format_quantity, text)
+    return ' '.join(text.split())
+
+
+def _normalize_chunk(texts: List[str]) -> List[str]:
+    return [normalize_text(text) for text in texts]
+
+
+def normalize_texts(texts: Union[pd.Series, Sequence[str]],
+                    n_jobs: int = 1,
+                    chunk_size: int = 5_000) -> Union[pd.Series, List[str]]:
+    """
+    Normalize a whole column or list of texts (batch preprocess_text).
+
+    Args:
+        texts: Series or list of texts; non-strings become ""
+        n_jobs: Worker processes; chunks of ``chunk_size`` texts are spread over them
+            (only worth it for large corpora, since texts are pickled to the workers)
+        chunk_size: Texts per worker task
+
+    Returns:
+        Normalized texts, as a Series with the same index when given a Series
+    """
+    values = texts.tolist() if isinstance(texts, pd.Series) else list(texts)
+    if n_jobs > 1 and len(values) > chunk_size:
+        chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+        with Pool(n_jobs) as pool:
+            normalized = [text for chunk in pool.imap(_normalize_chunk, chunks) for text in chunk]
+    else:
+        normalized = _normalize_chunk(values)
+    if isinstance(texts, pd.Series):
+        return pd.Series(normalized, index=texts.index, name=texts.name)
+    return normalized
+
+
+def _gender_label(word: str) -> str:
+    # Same replace chain as create_prompt (which turns "woman" into "womale")
+    return word.replace("man", "male").replace("woman", "female")
+
+
+def build_prompts(df: pd.DataFrame) -> pd.Series:
+    """
+    Column-wise create_prompt: same strings as ``df.apply(create_prompt, axis=1)``.
+
+    Reads each column once as an array instead of building one Series per
+    row, lowercases each prompt once, and uses precompiled age and gender
+    patterns.
+    """
+    prompts = [p.strip() for p in df['Prompt']]
+
+    context = [[] for _ in prompts]
+    for column, label, fmt in [('Nursing Competency', 'Competency', str),
+                               ('Clinical Panel', 'Panel', str),
+                               ('Years of Experience', 'Experience', lambda v: f"{int(v)} yrs")]:
+        if column not in df.columns:
+            continue
+        present = df[column].notna().to_numpy()
+        for i, value in zip(np.flatnonzero(present), df[column].to_numpy()[present]):
+            context[i].append(f"{label}: {fmt(value)}")
+
+    built = []
+    for parts, prompt in zip(context, prompts):
+        if parts:
+            prompt = f"Medical Context [{' | '.join(parts)}]: {prompt}"
+        lowered = prompt.lower()
+        patient = []
+        age_match = _AGE.search(lowered)
+        if age_match:
+            patient.append(f"Age: {age_match.group(1)}")
+        gender_match = _GENDER.search(lowered)
+        if gender_match:
+            patient.append(f"Gender: {_gender_label(gender_match.group(1))}")
+        if patient:
+            prompt = f"Patient [{ ' | '.join(patient) }] - {prompt}"
+        built.append(_PROMPT_PREFIX + prompt)
+    return pd.Series(built, index=df.index)
+
+
+def reference_preprocess_text(text: str) -> str:
+    """The notebook's preprocess_text, verbatim, for parity checks and benchmarks."""
+    if not isinstance(text, str):
+        return ""
+
+    # Lowercase and replace newlines with space
+    text = text.lower().replace('\n', ' ')
+
+    # Replace any non-alphanumeric and non-space characters with space
+    text = ''.join([c if c.isalnum() or c.isspace() else ' ' for c in text])
+
+    # Preserve medical abbreviations with periods
+    text = re.sub(r'([A-Za-z]\.)+([A-Za-z]\.)', lambda m: m.group().replace('.', '~DOT~'), text)
+
+    # Normalize medical measurements
+    text = re.sub(r'(\d+)[\s]*(?:mg|mgs|mcg|µg|ml|mls)', lambda m: f"{m.group(1)} {m.group()[len(m.group(1)):].strip()}",
+                  text)
+
+    # Normalize percentages
+    text = re.sub(r'(\d+)[\s]*(?:percent|pct)', r'\1%', text)
+
+    # Collapse multiple spaces into one
+    return ' '.join(text.split())
+
+
+def reference_create_prompt(row):
+    """The notebook's create_prompt, verbatim, for parity checks and benchmarks."""
+    prompt = row['Prompt'].strip()
+
+    # Add context if available
+    context_parts = []
+    if 'Nursing Competency' in row and not pd.isna(row['Nursing Competency']):
+        context_parts.append(f"Competency: {row['Nursing Competency']}")
+    if 'Clinical Panel' in row and not pd.isna(row['Clinical Panel']):
+        context_parts.append(f"Panel: {row['Clinical Panel']}")
+    if 'Years of Experience' in row and not pd.isna(row['Years of Experience']):
+        context_parts.append(f"Experience: {int(row['Years of Experience'])} yrs")
+
+    if context_parts:
+        prompt = f"Medical Context [{' | '.join(context_parts)}]: {prompt}"
+
+    # Add patient information if found in the text
+    age_gender = []
+    age_match = re.search(r'(\d+)[- ]?(?:year|yr)[- ]old', prompt.lower())
+    if age_match:
+        age_gender.append(f"Age: {age_match.group(1)}")
+
+    gender_match = re.search(r'\b(male|female|man|woman)\b', prompt.lower())
+    if gender_match:
+        gender = gender_match.group(1).replace("man", "male").replace("woman", "female")
+        age_gender.append(f"Gender: {gender}")
+
+    if age_gender:
+        prompt = f"Patient [{ ' | '.join(age_gender) }] - {prompt}"
+
+    return f"Based on clinical reasoning, provide a concise professional assessment for: {prompt}"
+
+
+def check_parity(df: pd.DataFrame, text_columns: Sequence[str] = ('Prompt', 'Clinician')) -> Dict[str, int]:
+    """
+    Compare the batch functions with the notebook's versions on ``df``.
+
+    Checks build_prompts against create_prompt row by row, and normalize_texts
+    against preprocess_text on the built prompts and on every column in
+    ``text_columns``. Raises AssertionError with the first mismatch.
+
+    Returns:
+        Number of strings compared per check
+    """
+    report = {}
+    expected = df.apply(reference_create_prompt, axis=1)
+    built = build_prompts(df)
+    _assert_equal("build_prompts", built.tolist(), expected.tolist())
+    report["build_prompts"] = len(df)
+
+    columns = {"Enhanced_Prompt": expected}
+    columns.update({column: df[column] for column in text_columns if column in df.columns})
+    for name, texts in columns.items():
+        _assert_equal(f"normalize_texts[{name}]", normalize_texts(texts).tolist(),
+                      [reference_preprocess_text(text) for text in texts])
+        report[f"normalize_texts[{name}]"] = len(texts)
+    return report
+
+
+def _assert_equal(name: str, actual: List[str], expected: List[str]):
+    for i, (a, e) in enumerate(zip(actual, expected)):
+        if a != e:
+            raise AssertionError(f"{name} differs at row {i}:\n  got      {a!r}\n  expected {e!r}")
+    assert len(actual) == len(expected), f"{name}: {len(actual)} outputs for {len(expected)} inputs"
+
+
+def synthetic_corpus(n_rows: int = 10_000, seed: int = 42) -> pd.DataFrame:
+    """Vignette-like rows (punctuation, units, percentages, ages, non-ASCII) for benchmarks and parity checks."""
+    rng = np.random.default_rng(seed)
+    fragments = [
+        "I am a nurse with {y} years of experience in a Level {l} hospital in Nakuru County.",
+        "A {a}-year-old {g} presents with fever (39.{d}°C), cough & SpO2 of {p} percent.",
+        "She was given paracetamol {d}00mg and IV fluids {a} ml/hr; Hb 8.{d} g/dL.",
+        "Vitals: BP {p}/{d}0 mmHg, pulse {p} bpm, RR {a}.\nNo nebulizer available!",
+        "Q1: What is the immediate management? Q2: When should we refer to the K.N.H.?",
+        "Mother reports 3 days of diarrhoea – µg dosing unclear, weight {a} kgs, {d}pct dehydrated…",
+    ]
+    rows = []
+    for _ in range(n_rows):
+        picks = rng.choice(len(fragments), size=rng.integers(3, 7))
+        text = " ".join(
+            fragments[i].format(y=rng.integers(1, 30), l=rng.integers(2, 7), a=rng.integers(1, 90),
+                                g=rng.choice(["male", "female", "man", "woman", "child"]),
+                                d=rng.integers(0, 10), p=rng.integers(60, 140))
+            for i in picks
+        )
+        rows.append({
+            "Prompt": f"  {text}  ",
+            "Nursing Competency": rng.choice(["child health", "general emergency", None]),
+            "Clinical Panel": rng.choice(["surgery", "paediatrics", None]),
+            "Years of Experience": rng.choice([float(rng.integers(5, 25)), np.nan]),
+            "Clinician": text.upper()[::-1],
+        })
+    return pd.DataFrame(rows)
+
+
+def benchmark_normalizer(df: Optional[pd.DataFrame] = None, n_jobs: int = 4) -> Dict[str, float]:
+    """
+    Time the notebook's row-wise functions against the batch ones on ``df``.
+
+    Returns:
+        Seconds and rows/second for create_prompt vs build_prompts, and for
+        preprocess_text vs normalize_texts on one core and on ``n_jobs`` processes
+    """
+    df = df if df is not None else synthetic_corpus()
+    check_parity(df.head(2_000))
+    report = {"rows": len(df)}
+
+    def timed(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        report[f"{name}_s"] = time.perf_counter() - start
+        report[f"{name}_rows_per_s"] = len(df) / report[f"{name}_s"]
+        return result
+
+    prompts = timed("create_prompt", lambda: df.apply(reference_create_prompt, axis=1))
+    timed("build_prompts", lambda: build_prompts(df))
+    timed("preprocess_text", lambda: prompts.apply(reference_preprocess_text))
+    timed("normalize_texts", lambda: normalize_texts(prompts))
+    timed("normalize_texts_parallel", lambda: normalize_texts(prompts, n_jobs=n_jobs))
+
+    print(f"⏱️ create_prompt {report['create_prompt_s']:.2f}s -> build_prompts {report['build_prompts_s']:.2f}s; "
+          f"preprocess_text {report['preprocess_text_s']:.2f}s -> normalize_texts {report['normalize_texts_s']:.2f}s "
+          f"({report['normalize_texts_parallel_s']:.2f}s on {n_jobs} processes)")
+    return report